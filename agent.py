@@ -1,5 +1,3 @@
-from langchain_core.messages import HumanMessage, SystemMessage
-from banking_data import simulate_large_expense
 from banking_data import risk_profile
 from banking_data import calculate_monthly_spending
 from banking_data import get_user_profile
@@ -8,111 +6,415 @@ from banking_data import rule_engine
 from banking_data import decision_confidence
 from banking_data import simulate_savings_increase
 from banking_data import dashboard_metrics
+from banking_data import period_metrics
+from banking_data import get_ledger_snapshot
 
 from banking_data import decision_confidence
-from langchain_community.chat_message_histories import ChatMessageHistory
-from llm_config import get_llm
+from memory import SessionStore
+from llm_client import get_client
+from response_cache import make_cache_key
+from response_cache import response_cache
+from json_stream import IncrementalJSONParser
+from structured_output import parse_structured_response
+from structured_output import validate_field
+from prompt_builder import SYSTEM_PROMPT
+from prompt_builder import build_agent_prompt
+from decision_engine import local_decision
+from decision_engine import parse_amounts
+from vector_store import retrieve_context
+from scenarios import scenario_grid
+from scenarios import grid_rows
+from tokens import count_tokens
+import tracing
+from tracing import span
+from log_config import debug_dump
+from log_config import get_logger
 
+import config
 
+
+import asyncio
+import copy
 import json
+import time
 
-# Initialize memory
-memory = ChatMessageHistory()
+logger = get_logger(__name__)
 
-def ambient_agent(user_query, risk_mode="Balanced"):
+# Per-session conversation memory with a token budget
+sessions = SessionStore.from_config()
 
-    llm = get_llm()
+DEFAULT_SESSION = "default"
 
-    # Core Data
-    spending = calculate_monthly_spending()
-    profile = get_user_profile()
-    metrics = calculate_financial_metrics()
-    flags = rule_engine(metrics)
-    scenario = simulate_large_expense(3000)
-    confidence = decision_confidence(metrics)
-    dashboard = dashboard_metrics()
+# What-if grid tabulated for every question; amounts named in the question
+# are added to the expense shocks
+SCENARIO_SHOCKS = (0, 3000, 10000)
+SCENARIO_SAVINGS_RATE_CHANGES = (0,)
+SCENARIO_INCOME_CHANGES = (0, -20)
+
+def _derive_context(data, risk_mode):
+    metrics = data["metrics"]
+    data["flags"] = rule_engine(metrics)
+    data["confidence"] = decision_confidence(metrics)
 
     # Use UI-selected risk mode
-    risk_data = risk_profile(metrics, mode=risk_mode)
-    selected_risk_mode = risk_data["profile"]
-    risk_mode = {
-        "profile": selected_risk_mode,
-        "tone": risk_data["tone"],
-        "max_recommendation_score": risk_data["max_recommendation_score"]
-    }
-
-    system_prompt = """
-You are an AI-powered personal finance assistant.
-
-Rules:
-- Provide practical and data-driven financial advice.
-- Be structured and concise.
-- Do not guarantee investment returns.
-- Highlight risks clearly.
-- Use previous conversation context when relevant.
-
-Respond ONLY in valid JSON format:
-
-{
-  "financial_assessment": "...",
-  "risk_level": "...",
-  "recommendation": "Yes / No / Cautious Yes",
-  "recommendation_score": 0-100,
-  "confidence_level": "Low / Medium / High",
-  "reasoning": ["point1", "point2", "point3"]
-}
-
-Do not include explanations outside the JSON.
-"""
-
-    user_context = f"""
-User Financial Goal:
-{profile.get('goal', 'Not specified')}
-
-Monthly Financial Overview:
-{spending}
-
-Financial Metrics:
-{metrics}
-
-Rule Engine Flags:
-{flags}
-
-Risk Profile:
-Mode: {risk_data['profile']}
-Tone Guidance: {risk_data['tone']}
-Max Recommendation Score Allowed: {risk_data['max_recommendation_score']}
-
-Confidence Level:
-{confidence}
-
-Dashboard Metrics:
-{dashboard}
-
-User Question:
-{user_query}
-
-Scenario Simulation:
-{scenario}
-"""
-
-    messages = [
-        SystemMessage(content=system_prompt),
-        *memory.messages,
-        HumanMessage(content=user_context)
+    data["risk_data"] = risk_profile(metrics, mode=risk_mode)
+    return data
+
+
+def _retrieve(user_query, account_id):
+    # Only the transactions and policy snippets relevant to this question
+    with span("retrieval"):
+        return retrieve_context(
+            user_query,
+            account_id,
+            transactions=config.RETRIEVAL_TRANSACTIONS,
+            policies=config.RETRIEVAL_POLICIES
+        )
+
+
+def scenario_table(user_query=None, account_id=None):
+    shocks = set(SCENARIO_SHOCKS)
+    if user_query:
+        shocks.update(parse_amounts(user_query))
+    grid = scenario_grid(
+        sorted(shocks),
+        SCENARIO_SAVINGS_RATE_CHANGES,
+        SCENARIO_INCOME_CHANGES,
+        account_id=account_id
+    )
+    return grid_rows(grid)
+
+
+def gather_context(risk_mode="Balanced", account_id=None, user_query=None):
+
+    with span("ledger_load"):
+        get_ledger_snapshot(account_id)
+
+    # Core Data
+    with span("metrics"):
+        data = {
+            "spending": calculate_monthly_spending(account_id),
+            "profile": get_user_profile(account_id),
+            "metrics": calculate_financial_metrics(account_id),
+            "scenarios": scenario_table(user_query, account_id),
+            "dashboard": dashboard_metrics(account_id),
+            "periods": period_metrics(account_id=account_id)
+        }
+    if user_query:
+        data["retrieved"] = _retrieve(user_query, account_id)
+    return _derive_context(data, risk_mode)
+
+
+async def agather_context(risk_mode="Balanced", account_id=None, user_query=None):
+
+    # Load the ledger once up front so the parallel readers share the snapshot
+    with span("ledger_load"):
+        await asyncio.to_thread(get_ledger_snapshot, account_id)
+
+    names = ["spending", "profile", "metrics", "scenarios", "dashboard", "periods"]
+    calls = [
+        asyncio.to_thread(calculate_monthly_spending, account_id),
+        asyncio.to_thread(get_user_profile, account_id),
+        asyncio.to_thread(calculate_financial_metrics, account_id),
+        asyncio.to_thread(scenario_table, user_query, account_id),
+        asyncio.to_thread(dashboard_metrics, account_id),
+        asyncio.to_thread(period_metrics, account_id=account_id)
     ]
+    if user_query:
+        names.append("retrieved")
+        calls.append(asyncio.to_thread(_retrieve, user_query, account_id))
+
+    with span("metrics"):
+        results = await asyncio.gather(*calls)
+    data = dict(zip(names, results))
+    return _derive_context(data, risk_mode)
+
+
+def build_prompt(user_query, context, session_id=DEFAULT_SESSION):
+    history = sessions.get(session_id).messages
+    return build_agent_prompt(user_query, context, history)
+
+
+def build_messages(user_query, context, session_id=DEFAULT_SESSION):
+    return build_prompt(user_query, context, session_id).messages
+
+
+def _traced_messages(user_query, context, session_id):
+    with span("prompt"):
+        prompt = build_prompt(user_query, context, session_id)
+        messages = prompt.messages
+    if tracing.current_trace() is not None:
+        tracing.incr("prompt_tokens", prompt.token_counts()["total"])
+    debug_dump(logger, messages, "prompt for session %s", session_id)
+    return messages
+
+
+def _count_completion(response=None, content=""):
+    # Provider-reported usage when available, otherwise our own estimate
+    if tracing.current_trace() is None:
+        return
+    usage = getattr(response, "usage_metadata", None) or {}
+    tracing.incr("completion_tokens", usage.get("output_tokens") or count_tokens(content))
+
+
+def _remember(session_id, user_query, content):
+    sessions.get(session_id).add_exchange(user_query, content)
+
+
+def _cache_key(user_query, context):
+    # Any change in the financial state yields a new key, so a ledger edit
+    # invalidates cached answers without explicit bookkeeping
+    state = {name: value for name, value in context.items() if name != "risk_data"}
+    return make_cache_key(SYSTEM_PROMPT, user_query, context["risk_data"]["profile"], state)
+
+
+def _cached_response(session_id, user_query, cache_key):
+    with span("cache_lookup"):
+        cached = response_cache.get(cache_key)
+    if cached is None:
+        tracing.incr("response_cache_misses")
+        return None
+    tracing.incr("response_cache_hits")
+    tracing.annotate(source="cache")
+    _remember(session_id, user_query, json.dumps(cached))
+    return copy.deepcopy(cached)
+
+
+def _max_score(context):
+    return context["risk_data"]["max_recommendation_score"]
+
+
+def _finish(session_id, user_query, content, cache_key, max_score=100):
+    # Noisy or slightly malformed output is repaired here rather than
+    # costing the user another generation
+    with span("parse"):
+        parsed_response = parse_structured_response(content, max_score)
+    if "error" in parsed_response:
+        tracing.incr("parse_failures")
+        logger.warning(
+            "Unusable model response in session %s: %s",
+            session_id, "; ".join(parsed_response["problems"])
+        )
+    debug_dump(logger, content, "model output for session %s", session_id)
+
+    _store_response(cache_key, parsed_response)
+    _remember(session_id, user_query, content)
+    return parsed_response
+
 
-    response = llm.invoke(messages)
+def _store_response(cache_key, parsed_response):
+    if cache_key is not None and "error" not in parsed_response:
+        response_cache.set(cache_key, copy.deepcopy(parsed_response))
 
+
+async def _off_loop(func, *args):
+    # The SQLite cache backend reads and commits on disk; keep that off the
+    # event loop. The in-memory cache alone is cheap enough to call inline.
+    if response_cache.backend is None:
+        return func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+def _fast_path_response(session_id, user_query, context, fast_path):
+    if fast_path is None:
+        fast_path = config.DECISION_FAST_PATH
+    if not fast_path:
+        return None
+
+    with span("rules"):
+        decision = local_decision(user_query, context)
+    if decision is not None:
+        tracing.incr("fast_path_answers")
+        tracing.annotate(source="rules")
+        _remember(session_id, user_query, json.dumps(decision))
+    return decision
+
+
+def ambient_agent(user_query, risk_mode="Balanced", account_id=None, use_cache=True,
+                  session_id=DEFAULT_SESSION, fast_path=None):
+    with tracing.trace("ambient_agent", risk_mode=risk_mode, account_id=account_id):
+        return _ambient_agent(
+            user_query, risk_mode, account_id, use_cache, session_id, fast_path
+        )
+
+
+def _ambient_agent(user_query, risk_mode, account_id, use_cache, session_id, fast_path):
+
+    with span("context"):
+        context = gather_context(risk_mode, account_id, user_query)
+
+    decision = _fast_path_response(session_id, user_query, context, fast_path)
+    if decision is not None:
+        return decision
+
+    cache_key = _cache_key(user_query, context) if use_cache else None
+    if cache_key is not None:
+        cached = _cached_response(session_id, user_query, cache_key)
+        if cached is not None:
+            return cached
+
+    llm = get_client()
+    messages = _traced_messages(user_query, context, session_id)
+
+    tracing.annotate(source="model")
+    with span("llm"):
+        try:
+            response = llm.invoke(messages)
+        except Exception:
+            logger.exception("LLM call failed in session %s", session_id)
+            raise
+    _count_completion(response, response.content)
+    return _finish(session_id, user_query, response.content, cache_key, _max_score(context))
+
+
+async def ambient_agent_async(user_query, risk_mode="Balanced", account_id=None,
+                              use_cache=True, session_id=DEFAULT_SESSION, fast_path=None):
+    with tracing.trace("ambient_agent_async", risk_mode=risk_mode, account_id=account_id):
+        return await _ambient_agent_async(
+            user_query, risk_mode, account_id, use_cache, session_id, fast_path
+        )
+
+
+async def _ambient_agent_async(user_query, risk_mode, account_id, use_cache, session_id,
+                               fast_path):
+
+    with span("context"):
+        context = await agather_context(risk_mode, account_id, user_query)
+
+    decision = _fast_path_response(session_id, user_query, context, fast_path)
+    if decision is not None:
+        return decision
+
+    cache_key = _cache_key(user_query, context) if use_cache else None
+    if cache_key is not None:
+        cached = await _off_loop(_cached_response, session_id, user_query, cache_key)
+        if cached is not None:
+            return cached
+
+    llm = get_client()
+    messages = _traced_messages(user_query, context, session_id)
+
+    tracing.annotate(source="model")
+    with span("llm"):
+        try:
+            response = await llm.ainvoke(messages)
+        except Exception:
+            logger.exception("LLM call failed in session %s", session_id)
+            raise
+    _count_completion(response, response.content)
+    parsed_response = _finish(session_id, user_query, response.content, None, _max_score(context))
+    await _off_loop(_store_response, cache_key, parsed_response)
+    return parsed_response
+
+
+def _replay(response):
+    for name, value in response.items():
+        yield {"type": "field", "name": name, "value": value}
+    yield {"type": "result", "response": response}
+
+
+# Pipeline stages reported by ambient_agent_stream, in order
+STAGE_CONTEXT = "context"
+STAGE_PROMPT = "prompt"
+STAGE_FIRST_TOKEN = "first_token"
+STAGE_PARSE = "parse"
+STAGES = (STAGE_CONTEXT, STAGE_PROMPT, STAGE_FIRST_TOKEN, STAGE_PARSE)
+
+
+def _stage(name, started, source=None):
+    event = {"type": "stage", "stage": name, "elapsed": round(time.perf_counter() - started, 4)}
+    if source is not None:
+        event["source"] = source
+    return event
+
+
+def ambient_agent_stream(user_query, risk_mode="Balanced", account_id=None, use_cache=True,
+                         session_id=DEFAULT_SESSION, fast_path=None):
+    # Yields {"type": "token"} events as the model produces text,
+    # {"type": "field"} events as each response field completes, and a
+    # final {"type": "result"} event with the parsed response. With the fast
+    # path off, a rules answer is still sent first as {"type": "provisional"}.
+    # {"type": "stage"} events mark each of STAGES as it completes, with the
+    # seconds elapsed since the call started; answers from the rules engine
+    # or the cache skip straight to "parse" with a "source".
+
+    # The trace is only made current around the code between yields, so the
+    # caller's context is never left pointing at it
+    trace = tracing.start_trace("ambient_agent_stream", risk_mode=risk_mode, account_id=account_id)
+    activate = tracing.activate
     try:
-        parsed_response = json.loads(response.content)
-    except json.JSONDecodeError:
-        parsed_response = {
-            "error": "Model did not return valid JSON",
-            "raw_response": response.content
-        }
+        started = time.perf_counter()
+        with activate(trace), span("context"):
+            context = gather_context(risk_mode, account_id, user_query)
+        yield _stage(STAGE_CONTEXT, started)
+
+        with activate(trace):
+            decision = _fast_path_response(session_id, user_query, context, fast_path)
+        if decision is not None:
+            yield _stage(STAGE_PARSE, started, source="rules")
+            yield from _replay(decision)
+            return
+
+        cache_key = _cache_key(user_query, context) if use_cache else None
+        if cache_key is not None:
+            with activate(trace):
+                cached = _cached_response(session_id, user_query, cache_key)
+            if cached is not None:
+                yield _stage(STAGE_PARSE, started, source="cache")
+                yield from _replay(cached)
+                return
+
+        provisional = local_decision(user_query, context)
+        if provisional is not None:
+            yield {"type": "provisional", "response": provisional}
+
+        with activate(trace):
+            llm = get_client()
+            messages = _traced_messages(user_query, context, session_id)
+            tracing.annotate(source="model")
+        yield _stage(STAGE_PROMPT, started)
+
+        parser = IncrementalJSONParser()
+        max_score = _max_score(context)
+        tokens = []
+
+        # Time to first token is queueing plus prompt processing; the rest
+        # is generation
+        requested = time.perf_counter()
+        first_token = None
 
-    memory.add_user_message(user_query)
-    memory.add_ai_message(response.content)
+        try:
+            for chunk in llm.stream(messages):
+                text = chunk.content
+                if not text:
+                    continue
+                if not tokens:
+                    first_token = time.perf_counter()
+                    if trace is not None:
+                        trace.add_span("llm_first_token", requested, first_token)
+                    yield _stage(STAGE_FIRST_TOKEN, started)
+                tokens.append(text)
+                yield {"type": "token", "text": text}
+                for name, value in parser.feed(text):
+                    try:
+                        value = validate_field(name, value, max_score)
+                    except ValueError:
+                        # Left for the final parse to report
+                        continue
+                    yield {"type": "field", "name": name, "value": value}
+        except Exception:
+            logger.exception(
+                "LLM stream failed in session %s after %d chunks", session_id, len(tokens)
+            )
+            raise
 
-    return parsed_response
\ No newline at end of file
+        content = "".join(tokens)
+        with activate(trace):
+            if trace is not None and first_token is not None:
+                trace.add_span("llm_generate", first_token, time.perf_counter())
+            _count_completion(content=content)
+            response = _finish(session_id, user_query, content, cache_key, max_score)
+        yield _stage(STAGE_PARSE, started, source="model")
+        yield {"type": "result", "response": response}
+    finally:
+        tracing.finish_trace(trace)
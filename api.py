@@ -0,0 +1,373 @@
+import asyncio
+import contextlib
+import json
+import time
+import uuid
+from datetime import date
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool
+
+from banking_data import calculate_financial_metrics
+from banking_data import calculate_financial_metrics_window
+from banking_data import dashboard_metrics
+from banking_data import dashboard_metrics_window
+from banking_data import get_account
+from banking_data import list_accounts
+from banking_data import resolve_period
+from agent import ambient_agent_async
+from agent import ambient_agent_stream
+from llm_client import get_client
+from llm_client import close_clients
+from llm_client import aclose_clients
+from scenarios import scenario_grid
+from scenarios import grid_rows
+from scenarios import simulate_runway
+from scenarios import DEFAULT_MONTHS, DEFAULT_PATHS, DEFAULT_SEED
+from vector_store import warm_knowledge_base
+from tracing import recorder
+import tracing
+from log_config import get_logger
+from log_config import setup_logging
+
+import config
+
+
+logger = get_logger(__name__)
+
+
+# ======================================================
+#                   BACKPRESSURE
+# ======================================================
+
+class ConcurrencyLimiter:
+    # Caps in-flight requests. Past the cap a bounded number of requests may
+    # wait for a slot; anything beyond that is turned away at once (429) and
+    # a waiter that times out gets 503, so overload never builds an
+    # unbounded queue in front of the LLM.
+
+    def __init__(self, name, limit, max_queued, timeout):
+        self.name = name
+        self.limit = limit
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.active = 0
+        self.queued = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            tracing.incr(f"{self.name}_rejected")
+            logger.warning("Rejected %s request: %d queued", self.name, self.queued)
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many {self.name} requests in flight",
+                headers={"Retry-After": "1"}
+            )
+
+        self.queued += 1
+        waited = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            tracing.incr(f"{self.name}_rejected")
+            logger.warning("Timed out after %.1fs waiting for a %s slot", self.timeout, self.name)
+            raise HTTPException(
+                status_code=503,
+                detail=f"Timed out waiting for a {self.name} slot",
+                headers={"Retry-After": str(int(self.timeout))}
+            )
+        finally:
+            self.queued -= 1
+        self.active += 1
+        tracing.observe(self.name, time.perf_counter() - waited, label="queue")
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def status(self):
+        return {"active": self.active, "queued": self.queued, "limit": self.limit}
+
+
+class SlotStreamingResponse(StreamingResponse):
+    # A streaming response that owns a limiter slot taken before it was
+    # built. The slot is released when the response finishes, fails or is
+    # cancelled, even if the body generator never started (a client that
+    # disconnects early on ASGI < 2.4 cancels the task before it runs).
+
+    def __init__(self, content, limiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self._limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter.release()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+ask_limiter = ConcurrencyLimiter(
+    "ask",
+    config.API_MAX_CONCURRENT_ASKS,
+    config.API_MAX_QUEUED_ASKS,
+    config.API_QUEUE_TIMEOUT_SECONDS
+)
+metrics_limiter = ConcurrencyLimiter(
+    "metrics",
+    config.API_MAX_CONCURRENT_METRICS,
+    config.API_MAX_QUEUED_METRICS,
+    config.API_QUEUE_TIMEOUT_SECONDS
+)
+
+
+# ======================================================
+#                   APP
+# ======================================================
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    setup_logging()
+    # One pooled LLM client for every request, built before traffic arrives
+    await asyncio.to_thread(get_client)
+    # The default account's retrieval index builds in the background
+    await asyncio.to_thread(warm_knowledge_base)
+    yield
+    await aclose_clients()
+    close_clients()
+    recorder.close()
+
+
+app = FastAPI(title="Ambient Finance API", lifespan=lifespan)
+
+
+class AskRequest(BaseModel):
+    question: str = Field(min_length=1)
+    risk_mode: str = "Balanced"
+    account_id: Optional[str] = None
+    # Omitted: a fresh conversation, whose id comes back with the answer
+    session_id: Optional[str] = Field(None, min_length=1)
+    use_cache: bool = True
+
+
+class RunwayRequest(BaseModel):
+    expense_shock: float = 0
+    months: int = Field(DEFAULT_MONTHS, ge=1, le=120)
+    paths: int = Field(DEFAULT_PATHS, ge=1, le=config.API_MAX_SIMULATION_PATHS)
+    seed: int = DEFAULT_SEED
+    with_income: bool = False
+
+
+class ScenarioRequest(BaseModel):
+    account_id: Optional[str] = None
+    expense_shocks: List[float] = [0]
+    savings_rate_changes: List[float] = [0]
+    income_changes: List[float] = [0]
+    runway: Optional[RunwayRequest] = None
+
+
+def _check_account(account_id):
+    try:
+        get_account(account_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown account: {account_id}")
+
+
+def _check_period(period, start, end, account_id):
+    try:
+        resolve_period(period, start, end, account_id=account_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ======================================================
+#                   METRICS
+# ======================================================
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "accounts": len(list_accounts()),
+        "ask": ask_limiter.status(),
+        "metrics": metrics_limiter.status()
+    }
+
+
+@app.get("/accounts")
+async def accounts():
+    return {"accounts": list_accounts()}
+
+
+@app.get("/metrics")
+async def metrics(account_id: Optional[str] = None, period: Optional[str] = None,
+                  start: Optional[date] = None, end: Optional[date] = None):
+    _check_account(account_id)
+    async with metrics_limiter.slot():
+        if period is None:
+            return await asyncio.to_thread(calculate_financial_metrics, account_id)
+        await asyncio.to_thread(_check_period, period, start, end, account_id)
+        return await asyncio.to_thread(
+            calculate_financial_metrics_window, period, start, end, None, account_id
+        )
+
+
+@app.get("/dashboard")
+async def dashboard(account_id: Optional[str] = None, period: Optional[str] = None,
+                    start: Optional[date] = None, end: Optional[date] = None):
+    _check_account(account_id)
+    async with metrics_limiter.slot():
+        if period is None:
+            return await asyncio.to_thread(dashboard_metrics, account_id)
+        await asyncio.to_thread(_check_period, period, start, end, account_id)
+        return await asyncio.to_thread(
+            dashboard_metrics_window, period, start, end, None, account_id
+        )
+
+
+@app.post("/scenarios")
+async def scenarios(request: ScenarioRequest):
+    _check_account(request.account_id)
+
+    cells = (
+        len(request.expense_shocks)
+        * len(request.savings_rate_changes)
+        * len(request.income_changes)
+    )
+    if cells > config.API_MAX_GRID_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Scenario grid has {cells} cells, limit is {config.API_MAX_GRID_CELLS}"
+        )
+
+    runway = request.runway
+    if runway is not None and runway.paths * runway.months > config.API_MAX_SIMULATION_CELLS:
+        # Memory grows with paths x months, so the product is what is capped
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Runway simulation of {runway.paths} paths x {runway.months} months exceeds "
+                f"{config.API_MAX_SIMULATION_CELLS} path-months"
+            )
+        )
+
+    async with metrics_limiter.slot():
+        grid = await asyncio.to_thread(
+            scenario_grid,
+            request.expense_shocks,
+            request.savings_rate_changes,
+            request.income_changes,
+            request.account_id
+        )
+        result = {"grid": grid_rows(grid)}
+
+        if runway is not None:
+            result["runway"] = await asyncio.to_thread(
+                simulate_runway,
+                runway.expense_shock,
+                runway.months,
+                runway.paths,
+                runway.seed,
+                runway.with_income,
+                request.account_id
+            )
+        return result
+
+
+# ======================================================
+#                   AGENT
+# ======================================================
+
+def _session_id(request):
+    # Clients that do not name a session never share one
+    return request.session_id or uuid.uuid4().hex
+
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    _check_account(request.account_id)
+    session_id = _session_id(request)
+    async with ask_limiter.slot():
+        response = await ambient_agent_async(
+            request.question,
+            risk_mode=request.risk_mode,
+            account_id=request.account_id,
+            use_cache=request.use_cache,
+            session_id=session_id
+        )
+    return {**response, "session_id": session_id}
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest):
+    # Newline-delimited JSON, one agent event per line. The slot is taken
+    # before the response starts, so an overloaded server still answers
+    # 429/503 rather than an empty stream, and the response object holds it
+    # until the stream ends.
+    _check_account(request.account_id)
+    session_id = _session_id(request)
+    await ask_limiter.acquire()
+
+    try:
+        events = ambient_agent_stream(
+            request.question,
+            risk_mode=request.risk_mode,
+            account_id=request.account_id,
+            use_cache=request.use_cache,
+            session_id=session_id
+        )
+
+        async def body():
+            async for event in iterate_in_threadpool(events):
+                yield json.dumps(event) + "\n"
+
+        return SlotStreamingResponse(
+            body(),
+            ask_limiter,
+            media_type="application/x-ndjson",
+            headers={"X-Session-Id": session_id}
+        )
+    except BaseException:
+        ask_limiter.release()
+        raise
+
+
+# ======================================================
+#                   TELEMETRY
+# ======================================================
+
+@app.get("/telemetry", response_class=PlainTextResponse)
+async def telemetry():
+    # Prometheus text exposition of counters and latency histograms
+    return recorder.prometheus_text()
+
+
+@app.get("/telemetry/traces")
+async def telemetry_traces(limit: int = 100):
+    return {"traces": recorder.recent(limit)}
+
+
+def main():
+    import uvicorn
+    uvicorn.run("api:app", host=config.API_HOST, port=config.API_PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 import streamlit as st
-from agent import ambient_agent
+from agent import ambient_agent_stream
+from agent import STAGES
 from banking_data import dashboard_metrics
+from banking_data import dashboard_metrics_window
+from banking_data import list_accounts
+from banking_data import get_account
+from banking_data import ledger_fingerprint
+from banking_data import file_fingerprint
+from scenarios import simulate_runway
+from scenarios import scenario_grid
+from vector_store import warm_knowledge_base
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import time
 import base64
 import json
+import uuid
+from log_config import get_logger
+from log_config import setup_logging
 
 # ======================================================
 #                   PAGE CONFIG
@@ -14,8 +26,11 @@ import json
 
 st.set_page_config(layout="wide")
 
-st.markdown(
-    """
+setup_logging()
+logger = get_logger("app")
+
+# Built once per process; only the theme colours vary between reruns
+BASE_CSS = """
     <style>
     .stApp {
         background: linear-gradient(rgba(0,0,0,0.55), rgba(0,0,0,0.55)),
@@ -54,9 +69,7 @@ st.markdown(
         backdrop-filter: blur(15px);
     }
     </style>
-    """,
-    unsafe_allow_html=True
-)
+"""
 
 # ======================================================
 #                   UTILITY FUNCTIONS
@@ -71,6 +84,7 @@ def decision_heat(score, confidence):
         return "🧊 Low Urgency"
 
 
+@st.cache_data(show_spinner=False, max_entries=128)
 def render_recommendation_gauge(score):
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
@@ -96,35 +110,17 @@ def render_recommendation_gauge(score):
     return fig
 
 
-# ======================================================
-#                   SIDEBAR
-# ======================================================
-
-st.sidebar.title("🛰 Navigation")
-page = st.sidebar.radio(
-    "Select View",
-    ["Dashboard", "AI Assistant", "Analytics", "Settings"]
-)
-
-risk_mode = st.sidebar.selectbox(
-    "AI Risk Personality",
-    ["Conservative", "Balanced", "Aggressive"]
-)
-
-# ======================================================
-#                   THEME
-# ======================================================
-
-theme = st.sidebar.toggle("🌗 Light Mode")
-
-if theme:
-    bg = "linear-gradient(135deg, #f0f0f0, #d9d9d9)"
-    text_color = "black"
-else:
-    bg = "linear-gradient(135deg, #0f2027, #203a43, #2c5364)"
-    text_color = "white"
+@st.cache_resource
+def page_css(light_mode):
+    # Both stylesheets go out in one element instead of two per rerun
+    if light_mode:
+        bg = "linear-gradient(135deg, #f0f0f0, #d9d9d9)"
+        text_color = "black"
+    else:
+        bg = "linear-gradient(135deg, #0f2027, #203a43, #2c5364)"
+        text_color = "white"
 
-st.markdown(f"""
+    return BASE_CSS + f"""
 <style>
 html, body {{
     background: {bg};
@@ -211,7 +207,166 @@ body {{
 
 <div class="particles"></div>
 
-""", unsafe_allow_html=True)
+"""
+
+
+# Progress text shown while each agent stage is running
+STAGE_LABELS = {
+    "context": "Gathering financial data...",
+    "prompt": "Building prompt...",
+    "first_token": "Waiting for the model...",
+    "parse": "Reading the answer..."
+}
+
+
+# ======================================================
+#                   CACHED COMPUTATION
+# ======================================================
+
+# Streamlit reruns this script on every widget change. Everything derived
+# from the ledger is cached under the ledger/profile fingerprint, so a rerun
+# with unchanged data costs two stat calls instead of a reload, and an edited
+# ledger produces a new key rather than a stale hit.
+
+def data_version(account_id=None):
+    account = get_account(account_id)
+    return ledger_fingerprint(account_id), file_fingerprint(account.profile_path)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_dashboard(account_id, version):
+    return dashboard_metrics(account_id)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_dashboard_window(period, start, end, account_id, version):
+    return dashboard_metrics_window(period, start=start, end=end, account_id=account_id)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_runway_simulation(expense_shock, with_income, account_id, version):
+    return simulate_runway(expense_shock, with_income=with_income, account_id=account_id)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_runway_surface(account_id, version):
+    return scenario_grid(
+        expense_shocks=np.arange(0, 10001, 1000),
+        income_changes=np.arange(-50, 21, 10),
+        account_id=account_id
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def render_projection_chart(runway_months, burn_rate_daily):
+    months = np.arange(1, 13)
+    projected_balance = runway_months * 1000 - months * burn_rate_daily * 30
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=months,
+        y=projected_balance,
+        mode="lines+markers",
+        name="Projected Balance"
+    ))
+
+    fig.update_layout(
+        title="12-Month Financial Projection",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis_title="Month",
+        yaxis_title="Balance"
+    )
+
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def render_balance_fan(expense_shock, with_income, account_id, version):
+    simulation = cached_runway_simulation(expense_shock, with_income, account_id, version)
+    bands = simulation["balance_bands"]
+    sim_months = np.arange(1, simulation["months"] + 1)
+
+    fan = go.Figure()
+    fan.add_trace(go.Scatter(
+        x=sim_months, y=bands["p95"], mode="lines",
+        line=dict(width=0), showlegend=False
+    ))
+    fan.add_trace(go.Scatter(
+        x=sim_months, y=bands["p5"], mode="lines", fill="tonexty",
+        line=dict(width=0), name="5th-95th percentile"
+    ))
+    fan.add_trace(go.Scatter(
+        x=sim_months, y=bands["p50"], mode="lines", name="Median balance"
+    ))
+
+    fan.update_layout(
+        title=f"Simulated Balance ({simulation['paths']:,} paths)",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis_title="Month",
+        yaxis_title="Balance"
+    )
+
+    return fan
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def render_runway_heatmap(account_id, version):
+    # Sensitivity surface: every shock / income change pair from one snapshot
+    surface = cached_runway_surface(account_id, version)
+
+    heatmap = go.Figure(go.Heatmap(
+        x=[f"{change:+.0f}%" for change in surface["income_changes"]],
+        y=surface["expense_shocks"],
+        z=surface["runway_months"][:, 0, :],
+        colorscale="RdYlGn",
+        colorbar=dict(title="Runway")
+    ))
+
+    heatmap.update_layout(
+        title="Runway Sensitivity (Months)",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis_title="Income Change",
+        yaxis_title="Unexpected Expense"
+    )
+
+    return heatmap
+
+
+# ======================================================
+#                   SIDEBAR
+# ======================================================
+
+st.sidebar.title("🛰 Navigation")
+page = st.sidebar.radio(
+    "Select View",
+    ["Dashboard", "AI Assistant", "Analytics", "Settings"]
+)
+
+risk_mode = st.sidebar.selectbox(
+    "AI Risk Personality",
+    ["Conservative", "Balanced", "Aggressive"]
+)
+
+accounts = list_accounts()
+account_id = None
+if len(accounts) > 1:
+    account_id = st.sidebar.selectbox("Account", accounts)
+
+version = data_version(account_id)
+# Large ledgers get their retrieval index built in the background
+warm_knowledge_base(account_id)
+
+# ======================================================
+#                   THEME
+# ======================================================
+
+theme = st.sidebar.toggle("🌗 Light Mode")
+
+st.markdown(page_css(bool(theme)), unsafe_allow_html=True)
 st.markdown("<div class='pulse'></div>", unsafe_allow_html=True)
 
 
@@ -222,6 +377,11 @@ st.markdown("<div class='pulse'></div>", unsafe_allow_html=True)
 if "auto_refresh" not in st.session_state:
     st.session_state.auto_refresh = True
 
+# Each browser session gets its own conversation memory in the agent
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
+
 # if st.session_state.auto_refresh:
 #    time.sleep(5)
 #    st.rerun()
@@ -236,7 +396,7 @@ if page == "Dashboard":
         unsafe_allow_html=True
     )
 
-    dashboard = dashboard_metrics()
+    dashboard = cached_dashboard(account_id, version)
 
     col1, col2, col3 = st.columns(3)
 
@@ -286,42 +446,87 @@ if page == "Dashboard":
 
     user_input = st.text_input("Ask your financial assistant:")
 
+    # The last answer survives reruns (other widgets, the voice button) and
+    # is only recomputed when asked again or when its inputs change
+    answer_key = (user_input, risk_mode, account_id, version)
+    response = None
+
     if st.button("Run Simulation"):
         with st.spinner("Analyzing financial signals..."):
-            time.sleep(1)
-            response = ambient_agent(user_input, risk_mode=risk_mode)
+            stream_placeholder = st.empty()
+            gauge_placeholder = st.empty()
+            recommendation_placeholder = st.empty()
+
+            streamed_text = ""
+            last_render = 0.0
+            response = {}
+
+            for event in ambient_agent_stream(
+                user_input, risk_mode=risk_mode, account_id=account_id, session_id=session_id
+            ):
+                if event["type"] == "token":
+                    streamed_text += event["text"]
+                    # Redraw at most every 50 ms; each redraw is a websocket message
+                    if time.monotonic() - last_render > 0.05:
+                        stream_placeholder.code(streamed_text, language="json")
+                        last_render = time.monotonic()
+
+                elif event["type"] == "field":
+                    if event["name"] == "recommendation":
+                        recommendation_placeholder.success(event["value"])
+                    elif event["name"] == "recommendation_score":
+                        gauge_placeholder.plotly_chart(
+                            render_recommendation_gauge(event["value"]),
+                            width="stretch"
+                        )
+
+                elif event["type"] == "provisional":
+                    provisional = event["response"]
+                    recommendation_placeholder.info(
+                        f"Provisional: {provisional['recommendation']} — refining with AI..."
+                    )
+                    gauge_placeholder.plotly_chart(
+                        render_recommendation_gauge(provisional["recommendation_score"]),
+                        width="stretch"
+                    )
+
+                elif event["type"] == "result":
+                    response = event["response"]
+
+            stream_placeholder.code(json.dumps(response, indent=2), language="json")
 
-            response_text = json.dumps(response, indent=2)
-            typing_placeholder = st.empty()
-            display_text = ""
+        st.session_state.dashboard_answer = {"key": answer_key, "response": response}
 
-            for char in response_text:
-                display_text += char
-                typing_placeholder.code(display_text, language="json")
-                time.sleep(0.01)
+    else:
+        stored = st.session_state.get("dashboard_answer")
+        if stored is not None and stored["key"] == answer_key:
+            response = stored["response"]
 
+            st.code(json.dumps(response, indent=2), language="json")
             if "recommendation_score" in response:
                 st.plotly_chart(
                     render_recommendation_gauge(response["recommendation_score"]),
-                    use_container_width=True
+                    width="stretch"
                 )
+            if "recommendation" in response:
+                st.success(response["recommendation"])
 
-            if "recommendation_score" in response and "confidence_level" in response:
-                heat_label = decision_heat(
-                    response["recommendation_score"],
-                    response["confidence_level"]
-                )
+    if response and "recommendation_score" in response and "confidence_level" in response:
+        heat_label = decision_heat(
+            response["recommendation_score"],
+            response["confidence_level"]
+        )
 
-                st.markdown("""
-                    <div style="text-align:center; font-size:12px; opacity:0.6;">AI signal processing complete ✔</div>
-                    </div>
-                     """, unsafe_allow_html=True)
-                
-                st.button("🎙 Activate Voice Mode")
-                st.info("Voice processing coming in next phase integration.")
+        st.markdown("""
+            <div style="text-align:center; font-size:12px; opacity:0.6;">AI signal processing complete ✔</div>
+            </div>
+             """, unsafe_allow_html=True)
 
+        st.button("🎙 Activate Voice Mode")
+        st.info("Voice processing coming in next phase integration.")
 
-                st.success(heat_label)
+
+        st.success(heat_label)
 
 
 # ======================================================
@@ -341,61 +546,78 @@ elif page == "AI Assistant":
 
     run_ai = st.button("🚀 Run AI Analysis")
 
+    assistant_key = (user_input, risk_mode, account_id, version)
+    response = None
+
     if run_ai:
 
         if not user_input.strip():
             st.warning("Please enter a question before running the AI.")
         else:
-            progress = st.progress(0)
-            for percent in range(100):
-                time.sleep(0.01)
-                progress.progress(percent + 1)
-
-            with st.spinner("Analyzing financial signals..."):
-                time.sleep(1)
-                response = ambient_agent(user_input, risk_mode=risk_mode)
-
+            progress = st.progress(0.0, text=STAGE_LABELS[STAGES[0]])
+
+            try:
+                for event in ambient_agent_stream(
+                    user_input, risk_mode=risk_mode, account_id=account_id, session_id=session_id
+                ):
+                    if event["type"] == "stage":
+                        # Rules and cache answers jump straight to the end
+                        done = STAGES.index(event["stage"]) + 1
+                        label = STAGE_LABELS.get(STAGES[done]) if done < len(STAGES) else None
+                        progress.progress(
+                            done / len(STAGES),
+                            text=label or f"Done in {event['elapsed']:.2f}s"
+                        )
+                    elif event["type"] == "result":
+                        response = event["response"]
+            except Exception as e:
+                logger.exception("Assistant request failed for account %s", account_id)
                 progress.empty()
+                st.error(f"Agent Error: {e}")
+                st.stop()
 
+            progress.empty()
+            st.session_state.assistant_answer = {"key": assistant_key, "response": response}
 
-                try:
-                    response = ambient_agent(user_input, risk_mode=risk_mode)
-                except Exception as e:
-                    st.error(f"Agent Error: {e}")
-                    st.stop()
+    else:
+        stored = st.session_state.get("assistant_answer")
+        if stored is not None and stored["key"] == assistant_key:
+            response = stored["response"]
 
-            col_left, col_right = st.columns([2, 1])
+    if response is not None:
 
-            # LEFT SIDE
-            with col_left:
-                st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                st.subheader("AI Financial Assessment")
+        col_left, col_right = st.columns([2, 1])
 
-                st.markdown("### 📊 AI Strategic Insight")
+        # LEFT SIDE
+        with col_left:
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            st.subheader("AI Financial Assessment")
 
-                st.write(response.get("analysis", "No analysis provided."))
+            st.markdown("### 📊 AI Strategic Insight")
 
-                if "recommendation" in response:
-                    st.success(response["recommendation"])
+            st.write(response.get("analysis", "No analysis provided."))
 
-                if "reasoning" in response:
-                    st.markdown(f"**AI Reasoning:** {response['reasoning']}")
-                    st.markdown('</div>', unsafe_allow_html=True)
+            if "recommendation" in response:
+                st.success(response["recommendation"])
 
-            # RIGHT SIDE
-            with col_right:
-                st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            if "reasoning" in response:
+                st.markdown(f"**AI Reasoning:** {response['reasoning']}")
+                st.markdown('</div>', unsafe_allow_html=True)
 
-                if "recommendation_score" in response:
-                    st.plotly_chart(
-                        render_recommendation_gauge(response["recommendation_score"]),
-                        width="stretch"
-                    )
+        # RIGHT SIDE
+        with col_right:
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+
+            if "recommendation_score" in response:
+                st.plotly_chart(
+                    render_recommendation_gauge(response["recommendation_score"]),
+                    width="stretch"
+                )
 
-                if "confidence_level" in response:
-                    st.markdown(f"### Confidence: {response['confidence_level']}")
+            if "confidence_level" in response:
+                st.markdown(f"### Confidence: {response['confidence_level']}")
 
-                st.markdown('</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
 
 
 
@@ -407,30 +629,41 @@ elif page == "Analytics":
 
     st.markdown('<div class="title">Financial Forecast Lab</div>', unsafe_allow_html=True)
 
-    dashboard = dashboard_metrics()
-
-    # Forecast Simulation
-    months = np.arange(1, 13)
-    projected_balance = dashboard["runway_months"] * 1000 - months * dashboard["burn_rate_daily"] * 30
+    period_options = {
+        "Last 30 Days": "30d",
+        "Last 90 Days": "90d",
+        "This Month": "month",
+        "All Time": "all",
+        "Custom Range": "custom"
+    }
 
-    fig = go.Figure()
+    period_label = st.selectbox("Analysis Period", list(period_options))
+    period = period_options[period_label]
 
-    fig.add_trace(go.Scatter(
-        x=months,
-        y=projected_balance,
-        mode="lines+markers",
-        name="Projected Balance"
-    ))
+    period_start, period_end = None, None
+    if period == "custom":
+        date_range = st.date_input("Date Range", value=[])
+        if len(date_range) != 2:
+            st.info("Select a start and end date.")
+            st.stop()
+        period_start, period_end = date_range
 
-    fig.update_layout(
-        title="12-Month Financial Projection",
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        xaxis_title="Month",
-        yaxis_title="Balance"
+    dashboard = cached_dashboard_window(
+        period, period_start, period_end, account_id, version
     )
 
-    st.plotly_chart(fig, width="stretch")
+    st.caption(f"{dashboard['start']} → {dashboard['end']}")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Savings Rate", f"{dashboard['savings_rate']}%")
+    col2.metric("Daily Burn Rate", f"${dashboard['burn_rate_daily']}")
+    col3.metric("Runway (Months)", dashboard["runway_months"])
+
+    # Forecast Simulation
+    st.plotly_chart(
+        render_projection_chart(dashboard["runway_months"], dashboard["burn_rate_daily"]),
+        width="stretch"
+    )
 
     # Risk Simulation Slider
     st.subheader("📊 Scenario Simulator")
@@ -443,16 +676,32 @@ elif page == "Analytics":
         step=500
     )
 
-    impact_runway = max(
-        0,
-        dashboard["runway_months"] - (expense_shock / 1000)
+    include_income = st.checkbox("Keep receiving income", value=False)
+
+    simulation = cached_runway_simulation(
+        expense_shock, include_income, account_id, version
+    )
+    runway = simulation["runway_months"]
+    horizon = simulation["months"]
+
+    def runway_label(value):
+        return f"{horizon}+" if value >= horizon else value
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Runway After Shock (Months)", runway_label(runway["p50"]))
+    col2.metric("Worst 5% Runway", runway_label(runway["p5"]))
+    col3.metric(
+        f"Shortfall Risk ({horizon} Months)",
+        f"{simulation['shortfall_probability'] * 100:.1f}%"
     )
 
-    st.metric(
-        "Runway After Shock (Months)",
-        round(impact_runway, 2)
+    st.plotly_chart(
+        render_balance_fan(expense_shock, include_income, account_id, version),
+        width="stretch"
     )
 
+    st.plotly_chart(render_runway_heatmap(account_id, version), width="stretch")
+
     # Transaction Table
     st.subheader("Recent Transactions")
 
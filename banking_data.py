@@ -1,20 +1,49 @@
+import hashlib
+import io
 import json
 import os
-from collections import defaultdict
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 
-def load_transactions():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(base_dir, "data", "transactions.json")
+import config
+import ledger_binary
+from prompt_builder import build_decision_prompt_text
+from tracing import span
+from log_config import debug_dump
+from log_config import get_logger
+from log_config import setup_logging
 
-    with open(file_path, "r") as file:
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+TRANSACTIONS_PATH = os.path.join(DATA_DIR, "transactions.json")
+LEDGER_BINARY_PATH = os.path.join(DATA_DIR, "transactions.bin")
+USER_PROFILE_PATH = os.path.join(DATA_DIR, "user_profile.json")
+METRICS_STATE_PATH = os.path.join(DATA_DIR, "metrics_state.json")
+
+# Extra accounts live in shards: data/accounts/<account_id>/transactions.json
+ACCOUNTS_DIR = os.path.join(DATA_DIR, "accounts")
+ACCOUNT_REGISTRY_PATH = os.path.join(DATA_DIR, "accounts.json")
+_ACCOUNT_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+logger = get_logger(__name__)
+
+
+def load_transactions(account_id=None):
+    with open(get_account(account_id).ledger_path, "r") as file:
         data = json.load(file)
-        return data["transactions"]
+    transactions = data["transactions"]
+    debug_dump(logger, transactions, "ledger %s (%d rows)", account_id or "default", len(transactions))
+    return transactions
 
 
-def load_user_profile():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(base_dir, "data", "user_profile.json")
+def load_user_profile(account_id=None):
+    file_path = get_account(account_id).profile_path
 
     if not os.path.exists(file_path):
         return {}
@@ -26,23 +55,693 @@ def load_user_profile():
         return json.loads(content)
 
 
+# ======================================================
+#                   STREAMING INGESTION
+# ======================================================
+
+STREAM_BLOCK_SIZE = 1 << 16
+STREAM_CHUNK_SIZE = 10000
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_json_decoder = json.JSONDecoder()
+
+
+class TransactionStream:
+    # Yields the objects of the top-level "transactions" array one at a time,
+    # reading the file in fixed-size blocks. `offset` is the byte position just
+    # past the last yielded transaction, so a later stream can resume there.
+
+    def __init__(self, path=None, start_offset=None, block_size=STREAM_BLOCK_SIZE):
+        self.path = path or TRANSACTIONS_PATH
+        self.start_offset = start_offset
+        self.block_size = block_size
+        self.offset = start_offset or 0
+        self.header = {}
+
+    def __iter__(self):
+        with open(self.path, "rb") as raw:
+            if self.start_offset:
+                raw.seek(self.start_offset)
+
+            with io.TextIOWrapper(raw, encoding="utf-8") as file:
+                self._file = file
+                self._buffer = ""
+                self._pos = 0
+                # _base is the byte offset of buffer index _mark
+                self._mark = 0
+                self._base = self.start_offset or 0
+                self._ascii = True
+                self._eof = False
+
+                # Resuming always starts right after a complete transaction
+                first = not self.start_offset
+                if first:
+                    self._enter_transactions_array()
+
+                while True:
+                    char = self._peek()
+                    if char == "]":
+                        return
+                    if not first:
+                        if char != ",":
+                            raise ValueError(f"Expected ',' in ledger file, found '{char}'")
+                        self._pos += 1
+                        self._peek()
+                    txn = self._decode_value()
+                    self.offset = self._byte_offset()
+                    first = False
+                    yield txn
+
+    def _fill(self):
+        if self._eof:
+            return False
+
+        self._base = self._byte_offset()
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        self._mark = 0
+
+        block = self._file.read(self.block_size)
+        if not block:
+            self._eof = True
+            return False
+
+        self._buffer += block
+        self._ascii = self._buffer.isascii()
+        return True
+
+    def _byte_offset(self):
+        # Only the text since the previous call is encoded, so a block with
+        # non-ASCII characters stays linear
+        if self._ascii:
+            return self._base + self._pos - self._mark
+        self._base += len(self._buffer[self._mark:self._pos].encode("utf-8"))
+        self._mark = self._pos
+        return self._base
+
+    def _peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError(f"Unexpected end of ledger file: {self.path}")
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in ledger file, found '{found}'")
+        self._pos += 1
+
+    def _decode_value(self):
+        # Callers position the cursor on the value with _peek() first
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A scalar ending at the buffer edge may continue in the next block
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def _enter_transactions_array(self):
+        self._expect("{")
+        while True:
+            char = self._peek()
+            if char == "}":
+                raise ValueError(f"No transactions array in ledger file: {self.path}")
+            if char == ",":
+                self._pos += 1
+                continue
+
+            key = self._decode_value()
+            self._expect(":")
+            if key == "transactions":
+                self._expect("[")
+                return
+            self._peek()
+            self.header[key] = self._decode_value()
+
+
+def read_ledger_header(path=None):
+    # Top-level fields (account_id, currency, ...) ahead of the transactions
+    stream = TransactionStream(path)
+    transactions = iter(stream)
+    next(transactions, None)
+    transactions.close()
+    return stream.header
+
+
+# A resume offset is checked against this many bytes at each end of the
+# ledger prefix, so the check costs the same at 10M rows as at 1k
+LEDGER_CHECK_WINDOW = 1 << 16
+
+
+def ledger_window_digest(path, offset):
+    # Digest of the header and of the rows just before `offset`. Appends
+    # never touch these bytes, and a rewrite that inserts or drops bytes
+    # anywhere before the offset shifts the tail window. The trade-off: a
+    # same-length in-place edit to a row between the two windows goes
+    # unnoticed until the next full rebuild.
+    hasher = hashlib.blake2b(digest_size=16)
+    head_end = min(offset, LEDGER_CHECK_WINDOW)
+    tail_start = max(head_end, offset - LEDGER_CHECK_WINDOW)
+    with open(path, "rb") as file:
+        hasher.update(file.read(head_end))
+        file.seek(tail_start)
+        hasher.update(file.read(offset - tail_start))
+    return hasher.hexdigest()
 
-def calculate_monthly_spending():
-    transactions = load_transactions()
-    print(type(transactions))
-    print(transactions)
 
-    total_income = 0
-    total_expenses = 0
-    category_breakdown = defaultdict(float)
+def ledger_offset_is_valid(path, offset, digest=None):
+    # A resume offset must still sit right after a transaction object and,
+    # when a digest was recorded, the bytes around it must be unchanged;
+    # anything else means the ledger was rewritten rather than appended to
+    if not offset:
+        return False
+    try:
+        if os.path.getsize(path) < offset:
+            return False
+        with open(path, "rb") as file:
+            file.seek(offset - 1)
+            if file.read(1) != b"}":
+                return False
+        if digest is not None:
+            return ledger_window_digest(path, offset) == digest
+        return True
+    except OSError:
+        return False
 
-    for txn in transactions:
+
+def iter_transactions(path=None, start_offset=None):
+    return iter(TransactionStream(path, start_offset=start_offset))
+
+
+def iter_transaction_chunks(chunk_size=STREAM_CHUNK_SIZE, path=None, start_offset=None):
+    chunk = []
+    for txn in iter_transactions(path, start_offset=start_offset):
+        chunk.append(txn)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RunningTotals:
+    # Constant-memory aggregator over a transaction stream
+
+    def __init__(self):
+        self.transaction_count = 0
+        self.total_income = 0
+        self.total_expenses = 0
+        self.category_breakdown = {}
+
+    def add(self, txn):
+        self.transaction_count += 1
         if txn["type"] == "credit":
-            total_income += txn["amount"]
+            self.total_income += txn["amount"]
         elif txn["type"] == "debit":
-            total_expenses += txn["amount"]
-            category_breakdown[txn["category"]] += txn["amount"]
+            self.total_expenses += txn["amount"]
+            category = txn["category"]
+            self.category_breakdown[category] = (
+                self.category_breakdown.get(category, 0.0) + txn["amount"]
+            )
+
+    def consume(self, transactions):
+        for txn in transactions:
+            self.add(txn)
+        return self
+
+    @property
+    def savings(self):
+        return self.total_income - self.total_expenses
+
+
+def stream_monthly_spending(path=None, account_id=None):
+    path = path or get_account(account_id).ledger_path
+    totals = RunningTotals().consume(iter_transactions(path))
+    return _spending_summary(
+        totals.total_income, totals.total_expenses, totals.category_breakdown
+    )
+
+
+def stream_financial_metrics(path=None, account_id=None):
+    path = path or get_account(account_id).ledger_path
+    totals = RunningTotals().consume(iter_transactions(path))
+    return _financial_summary(
+        totals.total_income, totals.total_expenses, _cached_user_profile(account_id)
+    )
+
+
+# ======================================================
+#                   ACCOUNTS
+# ======================================================
+
+class Account:
+
+    def __init__(self, account_id, ledger_path, profile_path,
+                 binary_path=None, state_path=None, user_id=None):
+        self.account_id = account_id
+        self.user_id = user_id
+        self.ledger_path = ledger_path
+        self.profile_path = profile_path
+        self.binary_path = binary_path or os.path.splitext(ledger_path)[0] + ".bin"
+        # Per ledger, like the .bin cache: registry accounts can share a
+        # directory
+        self.state_path = state_path or os.path.splitext(ledger_path)[0] + ".metrics_state.json"
+
+    def __repr__(self):
+        return f"Account({self.account_id!r}, {self.ledger_path!r})"
+
+
+class AccountRegistry:
+    # Resolves an account id to its files. Lookup order: the registry file
+    # (data/accounts.json), the default single-account files in data/, then
+    # a shard directory under data/accounts/<account_id>/.
+
+    def __init__(self, registry_path=ACCOUNT_REGISTRY_PATH, accounts_dir=ACCOUNTS_DIR):
+        self.registry_path = registry_path
+        self.accounts_dir = accounts_dir
+        self._lock = threading.Lock()
+        self._entries = (None, {})
+        self._default_id = (None, None)
+
+    def default_account(self):
+        return Account(
+            self.default_account_id(),
+            TRANSACTIONS_PATH,
+            USER_PROFILE_PATH,
+            binary_path=LEDGER_BINARY_PATH,
+            state_path=METRICS_STATE_PATH
+        )
+
+    def default_account_id(self):
+        fingerprint = file_fingerprint(TRANSACTIONS_PATH)
+        with self._lock:
+            if self._default_id[0] == fingerprint:
+                return self._default_id[1]
+
+        account_id = None
+        if fingerprint is not None:
+            account_id = read_ledger_header(TRANSACTIONS_PATH).get("account_id")
+
+        with self._lock:
+            self._default_id = (fingerprint, account_id)
+        return account_id
+
+    def _registry_entries(self):
+        fingerprint = file_fingerprint(self.registry_path)
+        with self._lock:
+            if self._entries[0] == fingerprint:
+                return self._entries[1]
+
+        entries = {}
+        if fingerprint is not None:
+            with open(self.registry_path, "r") as file:
+                entries = json.load(file).get("accounts", {})
+
+        with self._lock:
+            self._entries = (fingerprint, entries)
+        return entries
+
+    def _shard_dir(self, account_id):
+        # Ids come from API clients: only plain names, and the directory must
+        # still resolve inside accounts_dir
+        if not isinstance(account_id, str) or not _ACCOUNT_ID.match(account_id):
+            raise KeyError(f"Invalid account id: {account_id!r}")
+        root = os.path.realpath(self.accounts_dir)
+        shard = os.path.realpath(os.path.join(root, account_id))
+        if os.path.dirname(shard) != root:
+            raise KeyError(f"Invalid account id: {account_id!r}")
+        return shard
+
+    def get(self, account_id=None):
+        if account_id is None:
+            return self.default_account()
+
+        entry = self._registry_entries().get(account_id)
+        if entry is not None:
+            base = os.path.dirname(self.registry_path)
+            ledger_path = os.path.join(base, entry["ledger"])
+            return Account(
+                account_id,
+                ledger_path,
+                os.path.join(base, entry.get("profile", "user_profile.json")),
+                binary_path=entry.get("binary") and os.path.join(base, entry["binary"]),
+                user_id=entry.get("user_id")
+            )
+
+        if account_id == self.default_account_id():
+            return self.default_account()
+
+        shard = self._shard_dir(account_id)
+        if os.path.exists(os.path.join(shard, "transactions.json")):
+            return Account(
+                account_id,
+                os.path.join(shard, "transactions.json"),
+                os.path.join(shard, "user_profile.json")
+            )
+
+        raise KeyError(f"Unknown account: {account_id}")
+
+    def account_ids(self):
+        account_ids = []
+        default_id = self.default_account_id()
+        if default_id is not None:
+            account_ids.append(default_id)
+
+        account_ids.extend(self._registry_entries())
+
+        if os.path.isdir(self.accounts_dir):
+            for name in sorted(os.listdir(self.accounts_dir)):
+                if not _ACCOUNT_ID.match(name):
+                    continue
+                if os.path.exists(os.path.join(self._shard_dir(name), "transactions.json")):
+                    account_ids.append(name)
+
+        return list(dict.fromkeys(account_ids))
+
+
+account_registry = AccountRegistry()
+
+
+def get_account(account_id=None):
+    return account_registry.get(account_id)
+
+
+def list_accounts():
+    return account_registry.account_ids()
+
+
+# ======================================================
+#                   LEDGER SNAPSHOT
+# ======================================================
+
+def file_fingerprint(path):
+    # (mtime, size) is enough to notice edits and appends without hashing
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+TYPE_CREDIT = 0
+TYPE_DEBIT = 1
+TYPE_OTHER = 2
+
+_TYPE_CODES = {"credit": TYPE_CREDIT, "debit": TYPE_DEBIT}
+
+
+def _to_number(value):
+    # NumPy reductions return float64; keep whole amounts as plain ints
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def _concat(arrays, dtype):
+    if not arrays:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(arrays)
+
+
+class TransactionColumns:
+
+    def __init__(self, amounts, dates, types, category_codes, categories):
+        self.amounts = amounts
+        self.dates = dates
+        self.types = types
+        self.category_codes = category_codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        return cls.from_chunks([transactions])
+
+    @classmethod
+    def from_binary(cls, path):
+        ledger = ledger_binary.open_binary_ledger(path)
+        return cls(
+            ledger["amounts"],
+            ledger["dates"],
+            ledger["types"],
+            ledger["category_codes"],
+            ledger["categories"]
+        )
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        # Only one chunk of dicts is alive at a time; the rest is typed arrays
+        amounts = []
+        dates = []
+        types = []
+        category_codes = []
+        category_index = {}
+
+        for chunk in chunks:
+            chunk_codes = []
+            for txn in chunk:
+                category = txn.get("category", "Uncategorized")
+                code = category_index.get(category)
+                if code is None:
+                    code = category_index[category] = len(category_index)
+                chunk_codes.append(code)
+
+            amounts.append(np.fromiter(
+                (txn["amount"] for txn in chunk), dtype=np.float64, count=len(chunk)
+            ))
+            dates.append(np.array(
+                [txn.get("date") or "NaT" for txn in chunk], dtype="datetime64[D]"
+            ))
+            types.append(np.fromiter(
+                (_TYPE_CODES.get(txn["type"], TYPE_OTHER) for txn in chunk),
+                dtype=np.int8, count=len(chunk)
+            ))
+            category_codes.append(np.asarray(chunk_codes, dtype=np.int32))
+
+        return cls(
+            _concat(amounts, np.float64),
+            _concat(dates, "datetime64[D]"),
+            _concat(types, np.int8),
+            _concat(category_codes, np.int32),
+            list(category_index)
+        )
+
+    def category_totals(self, mask=None):
+        codes = self.category_codes
+        weights = self.amounts
+        if mask is not None:
+            codes = codes[mask]
+            weights = weights[mask]
+
+        n = len(self.categories)
+        totals = np.bincount(codes, weights=weights, minlength=n)
+        counts = np.bincount(codes, minlength=n)
+
+        # Categories keep the order in which they first appear in the ledger
+        return {
+            self.categories[code]: float(totals[code])
+            for code in np.flatnonzero(counts)
+        }
+
+
+class LedgerSnapshot:
+
+    def __init__(self, columns, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.columns = columns
+        self.transaction_count = len(columns)
+
+        credit = columns.types == TYPE_CREDIT
+        debit = columns.types == TYPE_DEBIT
+
+        self.total_income = _to_number(columns.amounts[credit].sum())
+        self.total_expenses = _to_number(columns.amounts[debit].sum())
+        self.category_breakdown = columns.category_totals(debit)
+        self._date_index = None
+
+    @property
+    def savings(self):
+        return self.total_income - self.total_expenses
+
+    @property
+    def date_index(self):
+        # Built on first windowed query and reused for the snapshot's lifetime
+        if self._date_index is None:
+            self._date_index = DateIndex(self.columns)
+        return self._date_index
+
+
+class DateIndex:
+    # Date-sorted view of the ledger with prefix sums, so the totals for any
+    # date range come from two binary searches and two subtractions
+
+    def __init__(self, columns):
+        order = np.argsort(columns.dates, kind="stable")
+        self.dates = columns.dates[order]
+        self.types = columns.types[order]
+        self.amounts = columns.amounts[order]
+        self.category_codes = columns.category_codes[order]
+        self.categories = columns.categories
+
+        credit = np.where(self.types == TYPE_CREDIT, self.amounts, 0.0)
+        debit = np.where(self.types == TYPE_DEBIT, self.amounts, 0.0)
+        self.cum_income = np.concatenate(([0.0], np.cumsum(credit)))
+        self.cum_expenses = np.concatenate(([0.0], np.cumsum(debit)))
+
+        # NaT sorts last; undated rows never fall inside a window
+        dated = self.dates[~np.isnat(self.dates)]
+        self.first_date = dated[0] if len(dated) else None
+        self.last_date = dated[-1] if len(dated) else None
+
+    def bounds(self, start, end):
+        lo = int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        hi = int(np.searchsorted(self.dates, np.datetime64(end, "D"), side="right"))
+        return lo, max(lo, hi)
+
+    def totals(self, start, end):
+        lo, hi = self.bounds(start, end)
+        return {
+            "income": _to_number(self.cum_income[hi] - self.cum_income[lo]),
+            "expenses": _to_number(self.cum_expenses[hi] - self.cum_expenses[lo]),
+            "transaction_count": hi - lo
+        }
+
+    def category_totals(self, start, end):
+        lo, hi = self.bounds(start, end)
+        debit = self.types[lo:hi] == TYPE_DEBIT
+        codes = self.category_codes[lo:hi][debit]
+        n = len(self.categories)
+        totals = np.bincount(codes, weights=self.amounts[lo:hi][debit], minlength=n)
+        counts = np.bincount(codes, minlength=n)
+        return {
+            self.categories[code]: float(totals[code])
+            for code in np.flatnonzero(counts)
+        }
+
+
+# Per-account caches are LRU-bounded, like SessionStore, so a long-running
+# multi-tenant process does not keep every ledger it has touched
+_cache_lock = threading.Lock()
+_snapshot_cache = OrderedDict()
+_profile_cache = OrderedDict()
+
+
+def _lru_get(cache, key):
+    # Callers hold the cache's lock
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache, key, value, max_entries=None):
+    cache[key] = value
+    cache.move_to_end(key)
+    max_entries = max_entries or config.LEDGER_CACHE_MAX_ACCOUNTS
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
+
+
+def _ledger_source(account):
+    # The binary ledger wins unless the JSON ledger was edited after it
+    binary = file_fingerprint(account.binary_path)
+    if binary is not None:
+        json_fingerprint = file_fingerprint(account.ledger_path)
+        if json_fingerprint is None or json_fingerprint[0] <= binary[0]:
+            return account.binary_path, binary
+    return account.ledger_path, file_fingerprint(account.ledger_path)
+
+
+def ledger_fingerprint(account_id=None):
+    # Changes whenever the ledger a snapshot would be built from changes;
+    # costs two stat calls, so callers can key their own caches on it
+    account = get_account(account_id)
+    path, fingerprint = _ledger_source(account)
+    return (path, fingerprint)
 
+
+def get_ledger_snapshot(account_id=None):
+    account = get_account(account_id)
+    fingerprint = ledger_fingerprint(account_id)
+    path = fingerprint[0]
+
+    with _cache_lock:
+        cached = _lru_get(_snapshot_cache, account.ledger_path)
+        if cached is not None and cached.fingerprint == fingerprint:
+            return cached
+
+    # Only reached on a cache miss, so the span shows real ledger reads
+    started = time.perf_counter()
+    with span("ledger_parse"):
+        if path == account.binary_path:
+            columns = TransactionColumns.from_binary(path)
+        else:
+            columns = TransactionColumns.from_chunks(iter_transaction_chunks(path=path))
+        snapshot = LedgerSnapshot(columns, fingerprint=fingerprint)
+    logger.info(
+        "Loaded ledger %s: %d transactions in %.3fs",
+        path, len(columns), time.perf_counter() - started
+    )
+
+    with _cache_lock:
+        _lru_put(_snapshot_cache, account.ledger_path, snapshot)
+    return snapshot
+
+
+def convert_ledger_to_binary(json_path=None, bin_path=None, account_id=None):
+    account = get_account(account_id)
+    json_path = json_path or account.ledger_path
+    bin_path = bin_path or account.binary_path
+
+    columns = TransactionColumns.from_chunks(iter_transaction_chunks(path=json_path))
+    ledger_binary.write_binary_ledger(
+        bin_path,
+        columns.amounts,
+        columns.dates,
+        columns.types,
+        columns.category_codes,
+        columns.categories
+    )
+    return bin_path
+
+
+def _cached_user_profile(account_id=None):
+    profile_path = get_account(account_id).profile_path
+    fingerprint = file_fingerprint(profile_path)
+
+    with _cache_lock:
+        cached = _lru_get(_profile_cache, profile_path)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+    profile = load_user_profile(account_id)
+
+    with _cache_lock:
+        _lru_put(_profile_cache, profile_path, (fingerprint, profile))
+    return profile
+
+
+def clear_ledger_cache():
+    with _cache_lock:
+        _snapshot_cache.clear()
+        _profile_cache.clear()
+    with _incremental_lock:
+        _incremental_cache.clear()
+
+
+
+def _spending_summary(total_income, total_expenses, category_breakdown):
     savings = total_income - total_expenses
     savings_rate = (savings / total_income) * 100 if total_income > 0 else 0
     expense_ratio = (total_expenses / total_income) * 100 if total_income > 0 else 0
@@ -60,6 +759,15 @@ def calculate_monthly_spending():
     }
 
 
+def calculate_monthly_spending(account_id=None):
+    total_income, total_expenses, category_breakdown = ledger_totals(account_id)
+    spending = _spending_summary(total_income, total_expenses, category_breakdown)
+    # Runs on every agent request: the dump is sampled and only formatted
+    # when DEBUG is on
+    debug_dump(logger, spending, "monthly spending")
+    return spending
+
+
 def calculate_risk_score(expense_ratio, savings_rate):
     if expense_ratio > 90:
         return "High Risk"
@@ -71,16 +779,10 @@ def calculate_risk_score(expense_ratio, savings_rate):
         return "Financially Stable"
 
 
-def get_user_profile():
-    return load_user_profile()
-
-def calculate_financial_metrics():
-    transactions = load_transactions()
-    profile = get_user_profile()
-
-    total_income = sum(t["amount"] for t in transactions if t["type"] == "credit")
-    total_expense = sum(t["amount"] for t in transactions if t["type"] == "debit")
+def get_user_profile(account_id=None):
+    return dict(_cached_user_profile(account_id))
 
+def _financial_summary(total_income, total_expense, profile):
     savings = total_income - total_expense
     savings_rate = (savings / total_income) * 100 if total_income else 0
 
@@ -96,6 +798,201 @@ def calculate_financial_metrics():
         "emergency_target": emergency_fund_target
     }
 
+def calculate_financial_metrics(account_id=None):
+    total_income, total_expenses, _ = ledger_totals(account_id)
+    return _financial_summary(total_income, total_expenses, _cached_user_profile(account_id))
+
+
+# ======================================================
+#                   INCREMENTAL METRICS
+# ======================================================
+
+class IncrementalMetrics(RunningTotals):
+    # Running aggregates persisted with a high-water mark, so a refresh only
+    # reads the transactions appended to the ledger since the last save.
+
+    def __init__(self, ledger_path=None, state_path=None, account_id=None):
+        super().__init__()
+        account = get_account(account_id)
+        self.account_id = account_id
+        self.ledger_path = ledger_path or account.ledger_path
+        self.state_path = state_path or account.state_path
+        self.last_transaction_id = None
+        self.last_date = None
+        self.offset = None
+        self.window_digest = None
+
+    def apply(self, txn):
+        self.add(txn)
+        self.last_transaction_id = txn.get("transaction_id", self.last_transaction_id)
+        if txn.get("date") and (self.last_date is None or txn["date"] > self.last_date):
+            self.last_date = txn["date"]
+
+    def apply_batch(self, transactions):
+        for txn in transactions:
+            self.apply(txn)
+        return self
+
+    def reset(self):
+        self.__init__(self.ledger_path, self.state_path, self.account_id)
+
+    def refresh(self):
+        # Resuming checks a fixed-size window around the high-water mark
+        # rather than re-hashing the whole prefix, so an append costs
+        # O(new transactions) however long the history is
+        if not ledger_offset_is_valid(self.ledger_path, self.offset, self.window_digest or ""):
+            self.reset()
+
+        stream = TransactionStream(self.ledger_path, start_offset=self.offset)
+        new_count = 0
+        for txn in stream:
+            self.apply(txn)
+            new_count += 1
+
+        if new_count or self.window_digest is None:
+            self.offset = stream.offset
+            self.window_digest = (
+                ledger_window_digest(self.ledger_path, self.offset) if self.offset else None
+            )
+        return new_count
+
+    def to_dict(self):
+        return {
+            "ledger_path": self.ledger_path,
+            "transaction_count": self.transaction_count,
+            "total_income": self.total_income,
+            "total_expenses": self.total_expenses,
+            "category_breakdown": self.category_breakdown,
+            "last_transaction_id": self.last_transaction_id,
+            "last_date": self.last_date,
+            "offset": self.offset,
+            "window_digest": self.window_digest
+        }
+
+    def save(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.to_dict(), file)
+        os.replace(tmp_path, self.state_path)
+
+    @classmethod
+    def load(cls, ledger_path=None, state_path=None, account_id=None):
+        engine = cls(ledger_path, state_path, account_id)
+        try:
+            with open(engine.state_path, "r") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return engine
+        except (OSError, json.JSONDecodeError) as error:
+            logger.warning("Ignoring unreadable metrics state %s: %s", engine.state_path, error)
+            return engine
+
+        # State saved for another ledger file is useless here
+        if os.path.abspath(state.get("ledger_path", "")) != os.path.abspath(engine.ledger_path):
+            return engine
+
+        engine.transaction_count = state["transaction_count"]
+        engine.total_income = state["total_income"]
+        engine.total_expenses = state["total_expenses"]
+        engine.category_breakdown = state["category_breakdown"]
+        engine.last_transaction_id = state["last_transaction_id"]
+        engine.last_date = state["last_date"]
+        engine.offset = state["offset"]
+        # State from before window digests were recorded is rebuilt on refresh
+        engine.window_digest = state.get("window_digest")
+        return engine
+
+    def spending(self):
+        return _spending_summary(
+            self.total_income, self.total_expenses, self.category_breakdown
+        )
+
+    def metrics(self):
+        return _financial_summary(
+            self.total_income, self.total_expenses, _cached_user_profile(self.account_id)
+        )
+
+
+def _refresh_and_save(engine):
+    if engine.refresh() or not os.path.exists(engine.state_path):
+        try:
+            engine.save()
+        except OSError as error:
+            # Read-only data directories still get correct totals
+            logger.warning("Could not save metrics state %s: %s", engine.state_path, error)
+    return engine
+
+
+def incremental_financial_metrics(ledger_path=None, state_path=None, account_id=None):
+    engine = IncrementalMetrics.load(ledger_path, state_path, account_id)
+    return _refresh_and_save(engine).metrics()
+
+
+_incremental_lock = threading.Lock()
+_incremental_cache = OrderedDict()
+# One lock per ledger, so a cold load only blocks callers of the same ledger.
+# Locks are never evicted, so two threads can never hold different locks
+# for one ledger; each is a few dozen bytes.
+_ledger_locks = {}
+
+
+def _money(value):
+    # Sums to the cent, so the snapshot's pairwise float sums and the running
+    # totals report identical figures
+    return _to_number(round(float(value), 2))
+
+
+def _totals(source):
+    return (
+        _money(source.total_income),
+        _money(source.total_expenses),
+        {category: _money(amount) for category, amount in source.category_breakdown.items()}
+    )
+
+
+def _ledger_lock(ledger_path):
+    with _incremental_lock:
+        return _ledger_locks.setdefault(ledger_path, threading.Lock())
+
+
+def _incremental_totals(account_id, account, fingerprint):
+    with _ledger_lock(account.ledger_path):
+        with _incremental_lock:
+            cached = _lru_get(_incremental_cache, account.ledger_path)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[2]
+
+        engine = cached[1] if cached is not None else IncrementalMetrics.load(account_id=account_id)
+        _refresh_and_save(engine)
+        # Copied while the ledger lock is held; readers never see the engine
+        # mid-refresh
+        totals = _totals(engine)
+        with _incremental_lock:
+            _lru_put(_incremental_cache, account.ledger_path, (fingerprint, engine, totals))
+        return totals
+
+
+def ledger_totals(account_id=None):
+    # (income, expenses, category breakdown) for the whole ledger. A snapshot
+    # already in memory answers directly; otherwise a JSON ledger is summed
+    # from the persisted IncrementalMetrics state, which only reads what was
+    # appended since the last save instead of parsing the whole ledger.
+    account = get_account(account_id)
+    fingerprint = ledger_fingerprint(account_id)
+
+    with _cache_lock:
+        cached = _lru_get(_snapshot_cache, account.ledger_path)
+    if cached is not None and cached.fingerprint == fingerprint:
+        return _totals(cached)
+
+    if fingerprint[0] != account.ledger_path or fingerprint[1] is None:
+        # Binary ledgers load as fast as the state file would
+        return _totals(get_ledger_snapshot(account_id))
+
+    income, expenses, breakdown = _incremental_totals(account_id, account, fingerprint)
+    return income, expenses, dict(breakdown)
+
+
 def evaluate_risk(metrics):
     if metrics["savings_rate"] < 10:
         return "High Risk"
@@ -104,8 +1001,8 @@ def evaluate_risk(metrics):
     else:
         return "Low Risk"
 
-def simulate_large_expense(amount):
-    metrics = calculate_financial_metrics()
+def simulate_large_expense(amount, account_id=None):
+    metrics = calculate_financial_metrics(account_id)
     new_savings = metrics["savings"] - amount
 
     new_savings_rate = (new_savings / metrics["income"]) * 100 if metrics["income"] else 0
@@ -130,57 +1027,20 @@ def format_spending_report(spending):
     return report
 
 
-def build_decision_prompt(question=None, scenario_amount=None):
-    metrics = calculate_financial_metrics()
-    spending = calculate_monthly_spending()
+def build_decision_prompt(question=None, scenario_amount=None, account_id=None):
+    metrics = calculate_financial_metrics(account_id)
+    spending = calculate_monthly_spending(account_id)
     risk_level = evaluate_risk(metrics)
-    profile = get_user_profile()
+    profile = get_user_profile(account_id)
 
     scenario_data = None
     if scenario_amount:
-        scenario_data = simulate_large_expense(scenario_amount)
+        scenario_data = simulate_large_expense(scenario_amount, account_id)
 
-    prompt = f"""
-You are a professional financial decision assistant.
-
-USER FINANCIAL METRICS:
-Income: {metrics['income']}
-Expenses: {metrics['expenses']}
-Savings: {metrics['savings']}
-Savings Rate: {metrics['savings_rate']}%
-Runway (days): {metrics['runway_days']}
-Emergency Fund Target: {metrics['emergency_target']}
-
-RISK LEVEL:
-{risk_level}
-
-CATEGORY BREAKDOWN:
-{spending['category_breakdown']}
-
-USER PROFILE:
-{profile}
-
-"""
-
-    if scenario_data:
-        prompt += f"""
-SCENARIO SIMULATION:
-New Savings After Expense: {scenario_data['new_savings']}
-New Savings Rate: {scenario_data['new_savings_rate']}%
-"""
-
-    if question:
-        prompt += f"\nUSER QUESTION:\n{question}\n"
-
-    prompt += """
-Provide:
-1. A short financial assessment
-2. Risk implications
-3. A clear recommendation (Yes / No / Cautious Yes)
-4. Reasoning in 3-5 bullet points
-"""
-
-    return prompt
+    return build_decision_prompt_text(
+        metrics, spending, risk_level, profile,
+        scenario=scenario_data, question=question
+    )
 
 
 def decision_confidence(metrics):
@@ -205,8 +1065,8 @@ def rule_engine(metrics):
 
     return flags
 
-def simulate_savings_increase(percent_increase):
-    metrics = calculate_financial_metrics()
+def simulate_savings_increase(percent_increase, account_id=None):
+    metrics = calculate_financial_metrics(account_id)
     
     additional_savings = metrics["income"] * (percent_increase / 100)
     new_savings = metrics["savings"] + additional_savings
@@ -221,8 +1081,8 @@ def simulate_savings_increase(percent_increase):
         "new_savings_rate": round(new_savings_rate, 2)
     }
 
-def simulate_large_expense(amount):
-    metrics = calculate_financial_metrics()
+def simulate_large_expense(amount, account_id=None):
+    metrics = calculate_financial_metrics(account_id)
 
     new_savings = metrics["savings"] - amount
     new_savings_rate = (
@@ -257,8 +1117,8 @@ def risk_profile(metrics, mode="Balanced"):
 
     return profiles.get(mode, profiles["Balanced"])
 
-def dashboard_metrics():
-    metrics = calculate_financial_metrics()
+def dashboard_metrics(account_id=None):
+    metrics = calculate_financial_metrics(account_id)
 
     burn_rate = metrics["expenses"] / 30 if metrics["expenses"] else 0
     runway_months = metrics["savings"] / metrics["expenses"] if metrics["expenses"] else 0
@@ -269,7 +1129,177 @@ def dashboard_metrics():
         "runway_months": round(runway_months, 2)
     }
 
+
+# ======================================================
+#                   TIME WINDOWS
+# ======================================================
+
+DAYS_PER_MONTH = 365.25 / 12
+
+ROLLING_PERIODS = {
+    "30d": 30,
+    "90d": 90
+}
+
+PERIODS = ("all", "month", "30d", "90d", "custom")
+
+
+def _anchor_date(index, as_of=None):
+    # Windows are anchored on the newest transaction unless told otherwise
+    as_of = np.datetime64(as_of, "D") if as_of is not None else index.last_date
+    if as_of is None:
+        as_of = np.datetime64("today", "D")
+    return as_of
+
+
+def _covered_days(index, start, end, as_of):
+    # Days of the window the ledger actually covers. A month still in
+    # progress, or a 90d window reaching back before the first transaction,
+    # would otherwise spread its spending over days that have no data.
+    if index.first_date is None:
+        return 0
+    first = max(start, index.first_date)
+    last = min(end, as_of)
+    return max(int((last - first).astype(int)) + 1, 0)
+
+
+def resolve_period(period="30d", start=None, end=None, as_of=None, account_id=None):
+    index = get_ledger_snapshot(account_id).date_index
+    as_of = _anchor_date(index, as_of)
+
+    if isinstance(period, (tuple, list)):
+        period, (start, end) = "custom", period
+
+    if period == "all":
+        start = index.first_date if index.first_date is not None else as_of
+        end = index.last_date if index.last_date is not None else as_of
+    elif period == "month":
+        start = as_of.astype("datetime64[M]").astype("datetime64[D]")
+        end = (as_of.astype("datetime64[M]") + 1).astype("datetime64[D]") - 1
+    elif period in ROLLING_PERIODS:
+        start = as_of - (ROLLING_PERIODS[period] - 1)
+        end = as_of
+    elif period == "custom":
+        if start is None or end is None:
+            raise ValueError("Custom periods need both start and end dates")
+        start = np.datetime64(start, "D")
+        end = np.datetime64(end, "D")
+    else:
+        raise ValueError(f"Unknown period '{period}', expected one of {PERIODS}")
+
+    if end < start:
+        raise ValueError(f"Period ends ({end}) before it starts ({start})")
+
+    return period, start, end
+
+
+def calculate_financial_metrics_window(period="30d", start=None, end=None, as_of=None,
+                                       account_id=None):
+    period, start, end = resolve_period(period, start, end, as_of, account_id)
+    index = get_ledger_snapshot(account_id).date_index
+    totals = index.totals(start, end)
+    profile = _cached_user_profile(account_id)
+
+    days = _covered_days(index, start, end, _anchor_date(index, as_of))
+    income = totals["income"]
+    expenses = totals["expenses"]
+    savings = income - expenses
+    savings_rate = (savings / income) * 100 if income else 0
+
+    burn_rate = expenses / days if days else 0
+    runway_days = savings / burn_rate if burn_rate else 0
+
+    return {
+        "period": period,
+        "start": str(start),
+        "end": str(end),
+        "days": days,
+        "transaction_count": totals["transaction_count"],
+        "income": income,
+        "expenses": expenses,
+        "savings": savings,
+        "savings_rate": round(savings_rate, 2),
+        "runway_days": round(runway_days, 1),
+        "emergency_target": profile.get("savings_goal", 0)
+    }
+
+
+def dashboard_metrics_window(period="30d", start=None, end=None, as_of=None,
+                             account_id=None):
+    metrics = calculate_financial_metrics_window(period, start, end, as_of, account_id)
+
+    burn_rate = metrics["expenses"] / metrics["days"] if metrics["days"] else 0
+    monthly_burn = burn_rate * DAYS_PER_MONTH
+    runway_months = metrics["savings"] / monthly_burn if monthly_burn else 0
+
+    return {
+        "period": metrics["period"],
+        "start": metrics["start"],
+        "end": metrics["end"],
+        "savings_rate": metrics["savings_rate"],
+        "burn_rate_daily": round(burn_rate, 2),
+        "runway_months": round(runway_months, 2)
+    }
+
+
+def category_breakdown_window(period="30d", start=None, end=None, as_of=None,
+                              account_id=None):
+    period, start, end = resolve_period(period, start, end, as_of, account_id)
+    return get_ledger_snapshot(account_id).date_index.category_totals(start, end)
+
+
+def period_metrics(periods=("month", "30d", "90d"), as_of=None, account_id=None):
+    return {
+        period: dashboard_metrics_window(period, as_of=as_of, account_id=account_id)
+        for period in periods
+    }
+
+
+# ======================================================
+#                   BATCH METRICS
+# ======================================================
+
+BATCH_SHARD_SIZE = 256
+
+
+def account_metrics(account_id=None):
+    try:
+        metrics = calculate_financial_metrics(account_id)
+    except (KeyError, OSError, ValueError) as error:
+        logger.warning("Metrics failed for account %s: %s", account_id, error)
+        return {"error": str(error)}
+
+    return {
+        "metrics": metrics,
+        "dashboard": dashboard_metrics(account_id),
+        "flags": rule_engine(metrics),
+        "risk_level": evaluate_risk(metrics)
+    }
+
+
+def _metrics_for_shard(account_ids):
+    return [(account_id, account_metrics(account_id)) for account_id in account_ids]
+
+
+def batch_account_metrics(account_ids=None, workers=None, shard_size=BATCH_SHARD_SIZE):
+    # Accounts are split into shards and each shard runs in a worker process,
+    # so one slow or large ledger only holds up its own shard
+    account_ids = list_accounts() if account_ids is None else list(account_ids)
+    shards = [
+        account_ids[i:i + shard_size]
+        for i in range(0, len(account_ids), shard_size)
+    ]
+
+    if workers == 1 or len(shards) <= 1:
+        results = map(_metrics_for_shard, shards)
+        return {account_id: result for shard in results for account_id, result in shard}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_metrics_for_shard, shards)
+        return {account_id: result for shard in results for account_id, result in shard}
+
 def main():
+    setup_logging()
     spending = calculate_monthly_spending()
     print(format_spending_report(spending))
 
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from agent import ambient_agent_async
+from agent import sessions
+from banking_data import get_account
+from decision_engine import classify_question
+from llm_client import default_provider
+from llm_client import aclose_clients
+from log_config import get_logger
+from log_config import setup_logging
+
+import config
+
+
+logger = get_logger(__name__)
+
+
+# ======================================================
+#                   RATE LIMITING
+# ======================================================
+
+class RateLimiter:
+    # Token bucket: at most `rate` calls per second on average, with bursts
+    # of up to `burst`
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def provider_limiters():
+    return {
+        "openai": RateLimiter(config.BATCH_OPENAI_RPS, config.BATCH_RATE_BURST),
+        "ollama": RateLimiter(config.BATCH_OLLAMA_RPS, config.BATCH_RATE_BURST)
+    }
+
+
+# ======================================================
+#                   INPUT / CHECKPOINT
+# ======================================================
+
+def load_jobs(path):
+    # One {"account_id", "question", "risk_mode"} object per line; "id"
+    # defaults to the line number so reruns of the same file line up
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            jobs.append({
+                "id": str(row.get("id", line_number)),
+                "account_id": row.get("account_id") or row.get("account"),
+                "question": row["question"],
+                "risk_mode": row.get("risk_mode", "Balanced")
+            })
+    return jobs
+
+
+def load_checkpoint(path, retry_failed=False):
+    # The output file is the checkpoint: every id already written is done,
+    # except failures when they are being retried
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn final line from an interrupted run
+                continue
+            if retry_failed and "error" in row:
+                continue
+            done.add(row["id"])
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+# ======================================================
+#                   RUNNER
+# ======================================================
+
+def _needs_llm(question):
+    # Questions the rules engine answers never reach the provider, so they
+    # skip the rate limiter
+    return not config.DECISION_FAST_PATH or classify_question(question)["intent"] is None
+
+
+async def run_job(job, limiter, max_retries, backoff):
+    session_id = f"batch:{job['id']}"
+    started = time.perf_counter()
+    attempts = 0
+    error = None
+
+    try:
+        get_account(job["account_id"])
+    except KeyError as e:
+        # Unknown account; retrying will not help
+        return {**job, "error": str(e), "attempts": 0, "elapsed": 0.0}
+
+    try:
+        while attempts <= max_retries:
+            attempts += 1
+            if _needs_llm(job["question"]):
+                await limiter.acquire()
+            try:
+                response = await ambient_agent_async(
+                    job["question"],
+                    risk_mode=job["risk_mode"],
+                    account_id=job["account_id"],
+                    session_id=session_id
+                )
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if "error" not in response:
+                    return {
+                        **job,
+                        "response": response,
+                        "attempts": attempts,
+                        "elapsed": round(time.perf_counter() - started, 3)
+                    }
+                error = response["error"]
+
+            logger.warning(
+                "Job %s attempt %d/%d failed: %s", job["id"], attempts, max_retries + 1, error
+            )
+            if attempts <= max_retries:
+                # Exponential backoff with jitter so retries do not stampede
+                await asyncio.sleep(backoff * 2 ** (attempts - 1) * (0.5 + random.random()))
+    finally:
+        # Batch rows are independent questions; no memory carries over
+        sessions.drop(session_id)
+
+    return {
+        **job,
+        "error": error,
+        "attempts": attempts,
+        "elapsed": round(time.perf_counter() - started, 3)
+    }
+
+
+async def run_batch(input_path, output_path, concurrency=None, max_retries=None,
+                    backoff=None, retry_failed=False, limiters=None):
+    concurrency = concurrency or config.BATCH_CONCURRENCY
+    max_retries = config.BATCH_MAX_RETRIES if max_retries is None else max_retries
+    backoff = config.BATCH_BACKOFF_SECONDS if backoff is None else backoff
+    limiter = (limiters or provider_limiters())[default_provider()]
+
+    done = load_checkpoint(output_path, retry_failed)
+    pending = [job for job in load_jobs(input_path) if job["id"] not in done]
+
+    summary = {"skipped": len(done), "succeeded": 0, "failed": 0}
+    if not pending:
+        return summary
+
+    queue = asyncio.Queue()
+    for job in pending:
+        queue.put_nowait(job)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        # Terminate a torn last line so the next result starts cleanly
+        if out.tell() and not _ends_with_newline(output_path):
+            out.write("\n")
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                result = await run_job(job, limiter, max_retries, backoff)
+                # Each finished row is flushed at once, so an interrupted
+                # run resumes from the last completed row
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                summary["failed" if "error" in result else "succeeded"] += 1
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)))))
+        finally:
+            await aclose_clients()
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the advisor over a JSONL file of questions")
+    parser.add_argument("input", help="JSONL rows with account_id, question, risk_mode")
+    parser.add_argument("output", help="JSONL results; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=config.BATCH_MAX_RETRIES)
+    parser.add_argument("--backoff", type=float, default=config.BATCH_BACKOFF_SECONDS)
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="rerun rows recorded as failed in the output")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    summary = asyncio.run(run_batch(
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        max_retries=args.retries,
+        backoff=args.backoff,
+        retry_failed=args.retry_failed
+    ))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
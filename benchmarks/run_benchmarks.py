@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Benchmarks run from the repo root or from this directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import agent
+import banking_data
+import vector_store
+from banking_data import AccountRegistry
+from banking_data import clear_ledger_cache
+from synthetic_ledger import SIZES, parse_size, write_ledger, write_profile
+
+
+DEFAULT_SIZES = ("1k", "100k", "1m")
+BENCH_ACCOUNT = "BENCH"
+
+STUB_RESPONSE = json.dumps({
+    "financial_assessment": "Spending is within income.",
+    "risk_level": "Low",
+    "recommendation": "Cautious Yes",
+    "recommendation_score": 70,
+    "confidence_level": "Medium",
+    "reasoning": ["Positive cash flow", "Runway above target", "Moderate volatility"]
+})
+
+
+# ======================================================
+#                   TIMING
+# ======================================================
+
+def time_call(fn, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "repeat": repeat,
+        "min": round(min(timings), 6),
+        "median": round(statistics.median(timings), 6),
+        "mean": round(statistics.fmean(timings), 6),
+        "max": round(max(timings), 6)
+    }
+
+
+def stub_llm():
+    # Local model that answers instantly, so the agent timing is all ours
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    return FakeListChatModel(responses=[STUB_RESPONSE])
+
+
+def remove_index():
+    path = os.path.splitext(banking_data.get_account(BENCH_ACCOUNT).ledger_path)[0]
+    for suffix in (".f32", ".jsonl", ".json"):
+        if os.path.exists(path + ".vector_index" + suffix):
+            os.remove(path + ".vector_index" + suffix)
+
+
+def use_bench_account(workdir):
+    # Point the account registry at the synthetic ledger's shard directory
+    banking_data.account_registry = AccountRegistry(
+        registry_path=os.path.join(workdir, "accounts.json"),
+        accounts_dir=os.path.join(workdir, "accounts")
+    )
+    clear_ledger_cache()
+
+
+# ======================================================
+#                   SUITE
+# ======================================================
+
+def bench_size(size, workdir, seed, repeat, agent_repeat, include_agent, include_binary):
+    count = parse_size(size)
+    shard = os.path.join(workdir, "accounts", BENCH_ACCOUNT)
+    ledger_path = os.path.join(shard, "transactions.json")
+
+    started = time.perf_counter()
+    write_ledger(ledger_path, count, seed, account_id=BENCH_ACCOUNT)
+    write_profile(os.path.join(shard, "user_profile.json"))
+    generate_seconds = time.perf_counter() - started
+
+    use_bench_account(workdir)
+    account = BENCH_ACCOUNT
+
+    # Large ledgers get fewer repetitions of the cold paths
+    cold_repeat = repeat if count <= SIZES["100k"] else max(1, repeat // 3)
+
+    results = {
+        "load_transactions": time_call(
+            lambda: banking_data.load_transactions(account), cold_repeat
+        )
+    }
+
+    def cold_start():
+        # No snapshot in memory and no saved incremental state
+        clear_ledger_cache()
+        state_path = banking_data.get_account(account).state_path
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+    for name, fn in (
+        ("calculate_monthly_spending", banking_data.calculate_monthly_spending),
+        ("calculate_financial_metrics", banking_data.calculate_financial_metrics),
+        ("dashboard_metrics", banking_data.dashboard_metrics)
+    ):
+        results[name] = time_call(lambda: fn(account), cold_repeat, setup=cold_start)
+        # A restart: totals come from the state saved by the run above
+        results[name + "_from_state"] = time_call(lambda: fn(account), repeat, setup=clear_ledger_cache)
+        results[name + "_warm"] = time_call(lambda: fn(account), repeat)
+
+    if include_binary:
+        binary_started = time.perf_counter()
+        banking_data.convert_ledger_to_binary(account_id=account)
+        results["convert_ledger_to_binary"] = round(time.perf_counter() - binary_started, 6)
+        results["calculate_financial_metrics_binary"] = time_call(
+            lambda: banking_data.calculate_financial_metrics(account),
+            repeat,
+            setup=cold_start
+        )
+        os.remove(banking_data.get_account(account).binary_path)
+        clear_ledger_cache()
+
+    if include_agent:
+        llm = stub_llm()
+        agent.get_client = lambda *args, **kwargs: llm
+        question = "Should I move part of my savings into an index fund?"
+
+        def ask():
+            agent.ambient_agent(
+                question, account_id=account, use_cache=False,
+                session_id="benchmark", fast_path=False
+            )
+            agent.sessions.drop("benchmark")
+
+        # Servers build the retrieval index in the background; here it is
+        # built up front and timed on its own
+        results["build_retrieval_index"] = time_call(
+            lambda: vector_store.KnowledgeBase(account).sync(), 1, setup=remove_index
+        )
+        vector_store.get_knowledge_base(account).sync()
+        results["ambient_agent_first"] = time_call(ask, 1)
+        results["ambient_agent"] = time_call(ask, agent_repeat)
+
+    return {
+        "size": size,
+        "transactions": count,
+        "ledger_bytes": os.path.getsize(ledger_path),
+        "generate_seconds": round(generate_seconds, 3),
+        "benchmarks": results
+    }
+
+
+def run(sizes=DEFAULT_SIZES, seed=42, repeat=5, agent_repeat=5, include_agent=True,
+        include_binary=True, workdir=None):
+    owned = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="ambient_bench_")
+    original_registry = banking_data.account_registry
+    original_client = agent.get_client
+
+    try:
+        results = [
+            bench_size(size, workdir, seed, repeat, agent_repeat, include_agent, include_binary)
+            for size in sizes
+        ]
+    finally:
+        banking_data.account_registry = original_registry
+        agent.get_client = original_client
+        clear_ledger_cache()
+        if owned:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the ledger and agent paths")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                        help="comma-separated: 1k,100k,1m,10m or a row count")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--agent-repeat", type=int, default=5)
+    parser.add_argument("--no-agent", action="store_true")
+    parser.add_argument("--no-binary", action="store_true")
+    parser.add_argument("--workdir", help="keep generated ledgers here")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(
+        sizes=[size.strip() for size in args.sizes.split(",") if size.strip()],
+        seed=args.seed,
+        repeat=args.repeat,
+        agent_repeat=args.agent_repeat,
+        include_agent=not args.no_agent,
+        include_binary=not args.no_binary,
+        workdir=args.workdir
+    )
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
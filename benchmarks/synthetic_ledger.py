@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+
+# Named sizes accepted by the benchmark runner
+SIZES = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000
+}
+
+# (category, type, share of rows, median amount, lognormal sigma, description)
+CATEGORIES = [
+    ("Salary", "credit", 0.010, 50000, 0.05, "Monthly salary"),
+    ("Freelance", "credit", 0.015, 6000, 0.60, "Freelance payment"),
+    ("Interest", "credit", 0.010, 250, 0.40, "Savings interest"),
+    ("Refund", "credit", 0.015, 900, 0.90, "Merchant refund"),
+    ("Rent", "debit", 0.010, 15000, 0.05, "Monthly rent"),
+    ("Groceries", "debit", 0.220, 1200, 0.60, "Supermarket purchase"),
+    ("Dining", "debit", 0.150, 650, 0.70, "Restaurant bill"),
+    ("Transport", "debit", 0.140, 400, 0.70, "Fuel refill"),
+    ("Utilities", "debit", 0.040, 1800, 0.35, "Electricity bill"),
+    ("Shopping", "debit", 0.120, 1500, 0.90, "Online order"),
+    ("Entertainment", "debit", 0.090, 800, 0.80, "Movie tickets"),
+    ("Healthcare", "debit", 0.030, 2000, 1.00, "Pharmacy"),
+    ("Subscriptions", "debit", 0.060, 499, 0.30, "Streaming subscription"),
+    ("Travel", "debit", 0.020, 9000, 0.90, "Flight booking"),
+    ("Insurance", "debit", 0.015, 3500, 0.20, "Insurance premium"),
+    ("Education", "debit", 0.055, 2500, 0.80, "Course fee")
+]
+
+WRITE_CHUNK = 100_000
+
+# Expenses as a share of income. Row shares above would otherwise have the
+# ledger spend ~2.7x its income at every size, so only the negative-savings
+# branches of metrics and advice ever ran.
+SPEND_RATIO = 0.8
+
+
+def generate_columns(count, seed=42, end_date="2026-02-28", months=24,
+                     spend_ratio=SPEND_RATIO):
+    # Column arrays for `count` transactions spread over `months` months
+    # ending at `end_date`, sorted by date. Same seed, same ledger.
+    rng = np.random.default_rng(seed)
+
+    names = [c[0] for c in CATEGORIES]
+    weights = np.array([c[2] for c in CATEGORIES])
+    codes = rng.choice(len(CATEGORIES), size=count, p=weights / weights.sum())
+
+    medians = np.array([c[3] for c in CATEGORIES], dtype=np.float64)
+    sigmas = np.array([c[4] for c in CATEGORIES], dtype=np.float64)
+    amounts = medians[codes] * np.exp(rng.standard_normal(count) * sigmas[codes])
+
+    # Scale debits so spending is spend_ratio of income whatever the row
+    # count; category mix and per-row spread are unchanged
+    debit = np.array([c[1] == "debit" for c in CATEGORIES])[codes]
+    income = amounts[~debit].sum()
+    expenses = amounts[debit].sum()
+    if income > 0 and expenses > 0:
+        amounts[debit] *= spend_ratio * income / expenses
+    amounts = np.round(amounts, 2)
+
+    end = np.datetime64(end_date, "D")
+    start = (end.astype("datetime64[M]") - (months - 1)).astype("datetime64[D]")
+    span = int((end - start).astype(np.int64)) + 1
+    dates = np.sort(start + rng.integers(0, span, size=count).astype("timedelta64[D]"))
+
+    return {
+        "dates": dates,
+        "codes": codes,
+        "amounts": amounts,
+        "categories": names,
+        "types": [c[1] for c in CATEGORIES],
+        "descriptions": [c[5] for c in CATEGORIES]
+    }
+
+
+def write_ledger(path, count, seed=42, account_id="BENCH", end_date="2026-02-28",
+                 months=24, spend_ratio=SPEND_RATIO):
+    # Writes a ledger in the same layout as data/transactions.json, a chunk
+    # at a time so 10M rows never sit in memory as Python dicts
+    columns = generate_columns(count, seed, end_date, months, spend_ratio)
+    categories = columns["categories"]
+    types = columns["types"]
+    descriptions = columns["descriptions"]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(json.dumps({"account_id": account_id, "currency": "INR"})[:-1])
+        file.write(', "transactions": [\n')
+
+        for offset in range(0, count, WRITE_CHUNK):
+            stop = min(offset + WRITE_CHUNK, count)
+            dates = columns["dates"][offset:stop].astype(str)
+            codes = columns["codes"][offset:stop]
+            amounts = columns["amounts"][offset:stop]
+
+            rows = [
+                '{"transaction_id": "T%d", "date": "%s", "type": "%s", '
+                '"amount": %s, "category": "%s", "description": "%s"}' % (
+                    offset + i + 1, date, types[code], repr(float(amount)),
+                    categories[code], descriptions[code]
+                )
+                for i, (date, code, amount) in enumerate(zip(dates, codes.tolist(), amounts))
+            ]
+            if offset:
+                file.write(",\n")
+            file.write(",\n".join(rows))
+
+        file.write("\n]}\n")
+    return path
+
+
+def write_profile(path, monthly_income=50000):
+    profile = {
+        "user_id": "BENCH_USER",
+        "name": "Benchmark",
+        "monthly_income": monthly_income,
+        "goal": "Build emergency fund",
+        "savings_goal": 10000,
+        "risk_tolerance": "medium"
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(profile, file, indent=4)
+    return path
+
+
+def parse_size(size):
+    size = str(size).lower()
+    if size in SIZES:
+        return SIZES[size]
+    return int(size)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python benchmarks/synthetic_ledger.py <size> [path] [seed]")
+        return
+
+    count = parse_size(argv[0])
+    path = argv[1] if len(argv) > 1 else f"transactions_{argv[0]}.json"
+    seed = int(argv[2]) if len(argv) > 2 else 42
+
+    write_ledger(path, count, seed)
+    print(f"Wrote {count} transactions to {path}")
+
+
+if __name__ == "__main__":
+    main()
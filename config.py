@@ -0,0 +1,69 @@
+import os
+
+# Response cache in front of the LLM
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "900"))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")  # e.g. data/response_cache.sqlite
+
+# Conversation memory: hard ceiling on history tokens sent with each prompt
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1200"))
+MEMORY_SUMMARY_TOKEN_BUDGET = int(os.getenv("MEMORY_SUMMARY_TOKEN_BUDGET", "300"))
+MEMORY_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "8"))
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+
+# Per-account in-memory caches (ledger snapshots, incremental metrics,
+# spending models): accounts kept before the least recently used is dropped
+LEDGER_CACHE_MAX_ACCOUNTS = int(os.getenv("LEDGER_CACHE_MAX_ACCOUNTS", "64"))
+
+# Answer questions the rules engine covers without calling the LLM
+DECISION_FAST_PATH = os.getenv("DECISION_FAST_PATH", "1") == "1"
+
+# Retrieval-augmented context: top-k hits added to each prompt
+RETRIEVAL_TRANSACTIONS = int(os.getenv("RETRIEVAL_TRANSACTIONS", "5"))
+RETRIEVAL_POLICIES = int(os.getenv("RETRIEVAL_POLICIES", "3"))
+# Ledgers larger than this (bytes) with no index on disk are indexed in a
+# background thread; until it finishes, answers go out without retrieval
+RETRIEVAL_INLINE_BUILD_BYTES = int(os.getenv("RETRIEVAL_INLINE_BUILD_BYTES", "2000000"))
+# Per-account indexes kept in memory, least recently used dropped first
+RETRIEVAL_MAX_INDEXES = int(os.getenv("RETRIEVAL_MAX_INDEXES", "8"))
+
+# HTTP API server
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+
+# HTTP API: in-flight request caps with a bounded wait queue behind them;
+# beyond the queue requests get 429, and a queued request that waits too
+# long gets 503
+API_MAX_CONCURRENT_ASKS = int(os.getenv("API_MAX_CONCURRENT_ASKS", "8"))
+API_MAX_QUEUED_ASKS = int(os.getenv("API_MAX_QUEUED_ASKS", "32"))
+API_MAX_CONCURRENT_METRICS = int(os.getenv("API_MAX_CONCURRENT_METRICS", "32"))
+API_MAX_QUEUED_METRICS = int(os.getenv("API_MAX_QUEUED_METRICS", "128"))
+API_QUEUE_TIMEOUT_SECONDS = float(os.getenv("API_QUEUE_TIMEOUT_SECONDS", "10"))
+API_MAX_SIMULATION_PATHS = int(os.getenv("API_MAX_SIMULATION_PATHS", "100000"))
+# paths x months per runway simulation (10k paths over 10 years)
+API_MAX_SIMULATION_CELLS = int(os.getenv("API_MAX_SIMULATION_CELLS", "1200000"))
+API_MAX_GRID_CELLS = int(os.getenv("API_MAX_GRID_CELLS", "100000"))
+
+# Batch advisory runner: parallel agent calls, per-provider request rate
+# (requests/second, 0 = unlimited) and retry policy
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_OPENAI_RPS = float(os.getenv("BATCH_OPENAI_RPS", "5"))
+BATCH_OLLAMA_RPS = float(os.getenv("BATCH_OLLAMA_RPS", "0"))
+BATCH_RATE_BURST = int(os.getenv("BATCH_RATE_BURST", "5"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "3"))
+BATCH_BACKOFF_SECONDS = float(os.getenv("BATCH_BACKOFF_SECONDS", "1"))
+
+# Request tracing: per-stage spans, counters and latency histograms. Recent
+# traces stay in memory; set TRACE_LOG_PATH to also append them as JSON lines
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")  # e.g. data/traces.jsonl
+
+# Logging: level for the app's "ambient.*" loggers, optional log file, and
+# debug dumps of ledgers/prompts/model output. Dumps only happen at DEBUG,
+# for a sampled fraction of calls, truncated to LOG_DEBUG_MAX_CHARS.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+LOG_FILE = os.getenv("LOG_FILE")  # e.g. data/ambient.log
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+LOG_DEBUG_MAX_CHARS = int(os.getenv("LOG_DEBUG_MAX_CHARS", "2000"))
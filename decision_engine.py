@@ -0,0 +1,225 @@
+import re
+
+
+# Questions the rules below answer without a model call
+AFFORDABILITY = "affordability"
+SAVINGS_INCREASE = "savings_increase"
+
+# Only an explicit purchase counts; "spend"/"expense" alone also shows up in
+# questions about past spending ("my spending over the last 30 days")
+_AFFORD = re.compile(r"\b(afford|buy|buying|purchase|purchasing|pay for|splurge on)\b", re.I)
+# Only explicit increases: "save 10% more", "save an extra 10%", "increase my
+# savings rate by 10%". "Invest 20% of my savings" is not one of these.
+_PCT = r"(\d+(?:\.\d+)?)\s*(?:%|percent\b)"
+_SAVE_MORE = re.compile(
+    r"\bsav(?:e|ing)\s+(?:an?\s+)?(?:extra|additional|another)\s+" + _PCT
+    + r"|\bsav(?:e|ing)\s+" + _PCT + r"\s+more\b"
+    + r"|\b(?:increase|increasing|raise|raising|boost|boosting)\s+(?:my\s+|the\s+|our\s+)?"
+    r"savings(?:\s+rate)?\s+by\s+" + _PCT,
+    re.I
+)
+# Moving, investing or losing money is a different question from saving or
+# spending it
+_OTHER_ACTION = re.compile(
+    r"\b(invest|investing|move|moving|put|putting|transfer|transferring|lost|lose|losing)\b",
+    re.I
+)
+# "rent of 1500 per month" is a commitment, not a one-off purchase
+_RECURRING = re.compile(
+    r"\b(?:per|a|an|each|every)\s+(?:day|week|month|quarter|year)\b"
+    r"|\b(?:daily|weekly|monthly|quarterly|yearly|annually|annual)\b"
+    r"|/\s*(?:day|wk|week|mo|month|yr|year)\b",
+    re.I
+)
+_AMOUNT = re.compile(
+    r"(?:[$₹£€]|\b(?:rs\.?|inr|usd)\s*)?"
+    r"(?<![\d.])(\d{1,3}(?:,\d{2,3})+|\d+(?:\.\d+)?)(?!\s*(?:%|percent))"
+    r"\s*(k|thousand|lakhs?|lacs?|m|mn|million)?\b",
+    re.I
+)
+# "30 days", "2 weeks": durations, not money
+_TIME_UNIT = re.compile(
+    r"\s*(?:days?|weeks?|months?|mo|years?|yrs?|hours?|hrs?|minutes?|mins?)\b", re.I
+)
+# A bare figure below this with no currency or unit is not trusted as a price
+MIN_BARE_AMOUNT = 100
+_MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3,
+    "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "m": 1e6, "mn": 1e6, "million": 1e6
+}
+
+_MODE_ADJUSTMENT = {
+    "Conservative": -10,
+    "Balanced": 0,
+    "Aggressive": 5
+}
+
+
+def _amount_matches(text):
+    # (amount, explicit) pairs; explicit means a currency or unit was given
+    for match in _AMOUNT.finditer(text):
+        amount = float(match.group(1).replace(",", ""))
+        unit = (match.group(2) or "").lower()
+        has_currency = not match.group(0)[0].isdigit()
+
+        if not unit and _TIME_UNIT.match(text, match.end()):
+            continue
+        # A bare four-digit number in this range is far more likely a year
+        if not unit and not has_currency and 1900 <= amount <= 2100:
+            continue
+        yield amount * _MULTIPLIERS.get(unit, 1), bool(unit or has_currency)
+
+
+def parse_amounts(text):
+    return [amount for amount, _ in _amount_matches(text)]
+
+
+def classify_question(user_query):
+    if _OTHER_ACTION.search(user_query):
+        return {"intent": None}
+
+    save_more = _SAVE_MORE.search(user_query)
+    if save_more:
+        percent = next(group for group in save_more.groups() if group is not None)
+        return {"intent": SAVINGS_INCREASE, "percent": float(percent)}
+
+    if _AFFORD.search(user_query) and not _RECURRING.search(user_query):
+        # Several figures ("2 phones at 500 each") or a figure that may not
+        # be a price need real reading; leave those to the model
+        amounts = list(_amount_matches(user_query))
+        if len(amounts) == 1:
+            amount, explicit = amounts[0]
+            if amount > 0 and (explicit or amount >= MIN_BARE_AMOUNT):
+                return {"intent": AFFORDABILITY, "amount": amount}
+
+    return {"intent": None}
+
+
+def _recommendation(score):
+    if score >= 70:
+        return "Yes"
+    if score >= 45:
+        return "Cautious Yes"
+    return "No"
+
+
+def _confidence_level(confidence):
+    # decision_confidence() returns "High Confidence", "Medium Confidence", ...
+    return confidence.split()[0] if confidence else "Low"
+
+
+def _risk_level(savings_rate):
+    if savings_rate < 10:
+        return "High"
+    if savings_rate < 25:
+        return "Moderate"
+    return "Low"
+
+
+def _finalize(raw_score, context, assessment, reasoning, risk_level):
+    risk_data = context["risk_data"]
+    raw_score += _MODE_ADJUSTMENT.get(risk_data["profile"], 0)
+    # Cap first so the label always agrees with the score reported
+    score = int(round(max(0, min(raw_score, 100, risk_data["max_recommendation_score"]))))
+
+    return {
+        "financial_assessment": assessment,
+        "risk_level": risk_level,
+        "recommendation": _recommendation(score),
+        "recommendation_score": score,
+        "confidence_level": _confidence_level(context["confidence"]),
+        "reasoning": reasoning,
+        "source": "rules"
+    }
+
+
+def assess_affordability(amount, context):
+    metrics = context["metrics"]
+    flags = context["flags"]
+    income = metrics["income"]
+    expenses = metrics["expenses"]
+    savings = metrics["savings"]
+
+    new_savings = savings - amount
+    new_rate = (new_savings / income) * 100 if income else 0
+    share_of_savings = amount / savings if savings > 0 else float("inf")
+    keeps_target = new_savings >= metrics["emergency_target"]
+    runway_days = new_savings / (expenses / 30) if expenses else 0
+
+    score = 50 + 0.5 * max(-50, min(60, new_rate))
+    score += 15 if keeps_target else -15
+    score -= 40 * max(0, min(share_of_savings, 2) - 0.5)
+    if "NEGATIVE_CASHFLOW" in flags:
+        score -= 20
+    if "CRITICAL_LOW_SAVINGS" in flags:
+        score -= 10
+    if "LOW_RUNWAY" in flags:
+        score -= 10
+    if new_savings < 0:
+        score = min(score, 20)
+
+    assessment = (
+        f"A {amount:,.0f} expense uses {min(share_of_savings, 9.99):.0%} of current savings "
+        f"({savings:,.0f}), leaving {new_savings:,.0f} and a savings rate of {new_rate:.1f}%."
+    )
+    reasoning = [
+        f"Savings after the expense: {new_savings:,.0f} "
+        f"({'above' if keeps_target else 'below'} the emergency target of "
+        f"{metrics['emergency_target']:,.0f}).",
+        f"Savings rate falls from {metrics['savings_rate']}% to {new_rate:.1f}%.",
+        f"Remaining runway is about {max(runway_days, 0):.0f} days at the current burn rate.",
+    ]
+    if flags:
+        reasoning.append(f"Risk flags present: {', '.join(flags)}.")
+
+    return _finalize(score, context, assessment, reasoning, _risk_level(new_rate))
+
+
+def assess_savings_increase(percent, context):
+    metrics = context["metrics"]
+    income = metrics["income"]
+    expenses = metrics["expenses"]
+
+    additional = income * (percent / 100)
+    new_rate = ((metrics["savings"] + additional) / income) * 100 if income else 0
+    required_cut = additional / expenses if expenses else float("inf")
+
+    if required_cut <= 0.15:
+        score = 80
+    elif required_cut <= 0.35:
+        score = 60
+    else:
+        score = 35
+    if "NEGATIVE_CASHFLOW" in context["flags"]:
+        score += 10  # cutting spend is exactly what a negative cashflow needs
+
+    assessment = (
+        f"Saving an extra {percent:g}% of income ({additional:,.0f}) needs a "
+        f"{min(required_cut, 9.99):.0%} cut in current expenses ({expenses:,.0f})."
+    )
+    reasoning = [
+        f"Savings rate would rise from {metrics['savings_rate']}% to {new_rate:.1f}%.",
+        f"Expenses would need to drop to {max(expenses - additional, 0):,.0f}.",
+        "Largest spending categories are the first place to look: "
+        + ", ".join(
+            category for category, _ in sorted(
+                context["spending"]["category_breakdown"].items(),
+                key=lambda item: item[1], reverse=True
+            )[:3]
+        ) + ".",
+    ]
+
+    return _finalize(score, context, assessment, reasoning, _risk_level(metrics["savings_rate"]))
+
+
+def local_decision(user_query, context):
+    # Returns a response in the LLM's JSON schema, or None when the question
+    # is not one the rules cover
+    question = classify_question(user_query)
+
+    if question["intent"] == AFFORDABILITY:
+        return assess_affordability(question["amount"], context)
+    if question["intent"] == SAVINGS_INCREASE:
+        return assess_savings_increase(question["percent"], context)
+    return None
@@ -0,0 +1,111 @@
+import json
+
+
+class IncrementalJSONParser:
+    # Feeds on model output as it streams and reports each top-level field of
+    # the response object as soon as its value is complete. Text before the
+    # first "{" (markdown fences, preambles) is skipped.
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "start"
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self._scalar = False
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            if self.done:
+                break
+
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._string_closed(i, completed)
+                continue
+
+            if self._state == "start":
+                if char == "{":
+                    self._depth = 1
+                    self._state = "key"
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._state == "key":
+                        self._key_start = i
+                    elif self._state == "value":
+                        self._begin_value(i, scalar=False)
+                continue
+
+            if char.isspace():
+                continue
+
+            if char in "{[":
+                if self._depth == 1 and self._state == "value":
+                    self._begin_value(i, scalar=False)
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._state == "value" and not self._scalar:
+                    self._complete(i + 1, completed)
+                elif self._depth == 0:
+                    if self._state == "value" and self._scalar:
+                        self._complete(i, completed)
+                    self.done = True
+            elif self._depth == 1:
+                if char == ":" and self._state == "colon":
+                    self._state = "value"
+                    self._value_start = None
+                elif char == ",":
+                    if self._state == "value" and self._scalar:
+                        self._complete(i, completed)
+                    self._state = "key"
+                elif self._state == "value" and self._value_start is None:
+                    self._begin_value(i, scalar=True)
+
+        self._pos = len(buffer)
+        return completed
+
+    def _begin_value(self, i, scalar):
+        if self._value_start is None:
+            self._value_start = i
+            self._scalar = scalar
+
+    def _string_closed(self, i, completed):
+        if self._state == "key":
+            self._key = json.loads(self.buffer[self._key_start:i + 1], strict=False)
+            self._state = "colon"
+        elif self._state == "value":
+            self._complete(i + 1, completed)
+
+    def _complete(self, end, completed):
+        raw = self.buffer[self._value_start:end].strip()
+        try:
+            value = json.loads(raw, strict=False)
+        except json.JSONDecodeError:
+            value = raw
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+        self._state = "after_value"
+        self._value_start = None
+        self._scalar = False
@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+
+# File layout:
+#   header      32 bytes (magic, version, record count, string table offset)
+#   records     record_count * RECORD_DTYPE.itemsize bytes
+#   categories  UTF-8 JSON array; record category codes index into it
+
+MAGIC = b"AFLEDGER"
+FORMAT_VERSION = 1
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("reserved", "<u4"),
+    ("record_count", "<u8"),
+    ("string_table_offset", "<u8")
+])
+
+RECORD_DTYPE = np.dtype([
+    ("amount", "<f8"),
+    ("date", "<i8"),
+    ("category", "<i4"),
+    ("type", "i1")
+])
+
+
+def write_binary_ledger(path, amounts, dates, types, category_codes, categories):
+    count = len(amounts)
+
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    records["amount"] = amounts
+    records["date"] = np.asarray(dates, dtype="datetime64[D]").view("<i8")
+    records["category"] = category_codes
+    records["type"] = types
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = FORMAT_VERSION
+    header["record_count"] = count
+    header["string_table_offset"] = HEADER_DTYPE.itemsize + records.nbytes
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(header.tobytes())
+        file.write(records.tobytes())
+        file.write(json.dumps(categories, ensure_ascii=False).encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header["magic"][0] != MAGIC:
+        raise ValueError(f"Not a binary ledger file: {path}")
+    if header["version"][0] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary ledger version {header['version'][0]}: {path}")
+    return header[0]
+
+
+def open_binary_ledger(path):
+    header = read_header(path)
+    count = int(header["record_count"])
+    table_offset = int(header["string_table_offset"])
+
+    if count:
+        records = np.memmap(
+            path, dtype=RECORD_DTYPE, mode="r",
+            offset=HEADER_DTYPE.itemsize, shape=(count,)
+        )
+    else:
+        records = np.empty(0, dtype=RECORD_DTYPE)
+
+    with open(path, "rb") as file:
+        file.seek(table_offset)
+        categories = json.loads(file.read().decode("utf-8"))
+
+    # Field views share the mapped pages; nothing is copied until touched
+    return {
+        "amounts": records["amount"],
+        "dates": records["date"].view("datetime64[D]"),
+        "types": records["type"],
+        "category_codes": records["category"],
+        "categories": categories
+    }
+
+
+def main(argv=None):
+    from banking_data import convert_ledger_to_binary
+
+    argv = sys.argv[1:] if argv is None else argv
+    json_path = argv[0] if len(argv) > 0 else None
+    bin_path = argv[1] if len(argv) > 1 else None
+
+    written = convert_ledger_to_binary(json_path, bin_path)
+    print(f"Wrote {written}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import threading
+
+import llm_config
+
+
+_lock = threading.Lock()
+_clients = {}
+_http_clients = {}
+
+
+def default_provider():
+    return "openai" if llm_config.USE_OPENAI else "ollama"
+
+
+def _default_model(provider):
+    return llm_config.OPENAI_MODEL if provider == "openai" else llm_config.OLLAMA_MODEL
+
+
+# ======================================================
+#                   HTTP POOLS
+# ======================================================
+
+def _httpx_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=llm_config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=llm_config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=llm_config.LLM_KEEPALIVE_EXPIRY
+    )
+
+
+def _openai_http_clients():
+    import httpx
+
+    # Only called from _build_client, which runs under _lock
+    if "openai" not in _http_clients:
+        _http_clients["openai"] = (
+            httpx.Client(limits=_httpx_limits(), timeout=llm_config.LLM_TIMEOUT),
+            httpx.AsyncClient(limits=_httpx_limits(), timeout=llm_config.LLM_TIMEOUT)
+        )
+    return _http_clients["openai"]
+
+
+# ======================================================
+#                   CLIENTS
+# ======================================================
+
+def _build_client(provider, model, temperature):
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+
+        http_client, http_async_client = _openai_http_clients()
+        model_kwargs = {}
+        if llm_config.LLM_JSON_MODE:
+            model_kwargs["response_format"] = {"type": "json_object"}
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            http_async_client=http_async_client,
+            model_kwargs=model_kwargs
+        )
+
+    if provider == "ollama":
+        from langchain_ollama import ChatOllama
+
+        # client_kwargs go to the ollama package's httpx clients, so each
+        # cached model keeps one pooled sync and one pooled async client
+        return ChatOllama(
+            model=model,
+            temperature=temperature,
+            keep_alive=llm_config.OLLAMA_KEEP_ALIVE,
+            format="json" if llm_config.LLM_JSON_MODE else None,
+            client_kwargs={"limits": _httpx_limits(), "timeout": llm_config.LLM_TIMEOUT}
+        )
+
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def get_client(provider=None, model=None, temperature=None):
+    provider = provider or default_provider()
+    model = model or _default_model(provider)
+    temperature = llm_config.TEMPERATURE if temperature is None else temperature
+    key = (provider, model, temperature)
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _build_client(provider, model, temperature)
+    return client
+
+
+def _ollama_clients(client):
+    # The ollama package's Client/AsyncClient pair behind a ChatOllama
+    return getattr(client, "_client", None), getattr(client, "_async_client", None)
+
+
+def close_clients():
+    with _lock:
+        clients = list(_clients.items())
+        _clients.clear()
+        openai_clients = _http_clients.pop("openai", None)
+
+    # Async clients can only be closed from an event loop; servers call
+    # aclose_clients() first, which closes both halves
+    if openai_clients is not None:
+        http_client, _ = openai_clients
+        http_client.close()
+    for (provider, _, _), client in clients:
+        if provider == "ollama":
+            sync_client, _ = _ollama_clients(client)
+            if sync_client is not None:
+                sync_client.close()
+
+
+async def aclose_clients():
+    # Async HTTP clients belong to the event loop that used them. Close them
+    # and drop every cached model, so the next get_client() builds fresh
+    # pools on whatever loop comes next.
+    with _lock:
+        clients = list(_clients.items())
+        _clients.clear()
+        openai_clients = _http_clients.pop("openai", None)
+
+    if openai_clients is not None:
+        http_client, http_async_client = openai_clients
+        await http_async_client.aclose()
+        http_client.close()
+    for (provider, _, _), client in clients:
+        if provider == "ollama":
+            sync_client, async_client = _ollama_clients(client)
+            if async_client is not None:
+                await async_client.close()
+            if sync_client is not None:
+                sync_client.close()
@@ -2,17 +2,24 @@ import os
 
 USE_OPENAI = False  # Switch to True when you enable billing
 
+OPENAI_MODEL = "gpt-4o-mini"
+OLLAMA_MODEL = "mistral"
+TEMPERATURE = 0.2
+
+# Ask the provider for JSON-only output (Ollama format="json", OpenAI
+# response_format json_object) so fewer answers need repair
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "1") == "1"
+
+# Connection pool shared by every client in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+# How long Ollama keeps the model loaded between requests
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
 def get_llm():
-    if USE_OPENAI:
-        from langchain_openai import ChatOpenAI
-        return ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.2,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-    else:
-        from langchain_community.chat_models import ChatOllama
-        return ChatOllama(
-            model="mistral",
-            temperature=0.2
-        )
+    from llm_client import get_client
+    return get_client()
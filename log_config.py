@@ -0,0 +1,88 @@
+import logging
+import os
+import random
+import reprlib
+
+import config
+
+
+# Every module logs under this namespace, so one setting covers the app
+# without touching the levels of streamlit, uvicorn or the HTTP clients
+ROOT_LOGGER = "ambient"
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_configured = False
+
+
+def get_logger(name):
+    # get_logger(__name__) -> "ambient.<module>"
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def setup_logging(level=None, path=None, force=False):
+    # Idempotent: streamlit reruns the app script on every interaction
+    global _configured
+    if _configured and not force:
+        return logging.getLogger(ROOT_LOGGER)
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    path = path or config.LOG_FILE
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = logging.FileHandler(path, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    logger.addHandler(handler)
+    logger.setLevel(level or config.LOG_LEVEL)
+    logger.propagate = False
+    _configured = True
+    return logger
+
+
+# ======================================================
+#                   SAMPLED DEBUG DUMPS
+# ======================================================
+
+class _Preview:
+    # Formats the dumped value only if a handler actually emits the record
+
+    __slots__ = ("value",)
+
+    _repr = reprlib.Repr()
+    _repr.maxlist = _repr.maxdict = _repr.maxtuple = 20
+    _repr.maxstring = _repr.maxother = 200
+    _repr.maxlevel = 4
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        text = self.value if isinstance(self.value, str) else self._repr.repr(self.value)
+        limit = config.LOG_DEBUG_MAX_CHARS
+        if len(text) > limit:
+            text = f"{text[:limit]}... [{len(text) - limit} more chars]"
+        return text
+
+
+def debug_sampled(logger):
+    # Cheap gate for hot paths: a cached level check, then the sample draw
+    return (
+        logger.isEnabledFor(logging.DEBUG)
+        and random.random() < config.LOG_DEBUG_SAMPLE_RATE
+    )
+
+
+def debug_dump(logger, value, msg, *args):
+    # Large payloads (ledgers, prompts, raw model output) go to the log for a
+    # sampled fraction of calls only, truncated, and never above DEBUG. The
+    # label is a %-format string like any log call, so nothing is formatted
+    # unless the dump is actually taken.
+    if debug_sampled(logger):
+        logger.debug(msg + ": %s", *args, _Preview(value))
@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+import config
+from tokens import count_tokens, truncate_to_tokens
+
+
+DIGEST_LINE_CHARS = 160
+
+
+def _one_line(text, limit=DIGEST_LINE_CHARS):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _answer_gist(content):
+    # Agent answers are JSON; the recommendation and score carry the gist
+    try:
+        answer = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return _one_line(content)
+
+    if not isinstance(answer, dict):
+        return _one_line(content)
+
+    parts = []
+    if "recommendation" in answer:
+        parts.append(str(answer["recommendation"]))
+    if "recommendation_score" in answer:
+        parts.append(f"score {answer['recommendation_score']}")
+    if "financial_assessment" in answer:
+        parts.append(str(answer["financial_assessment"]))
+    return _one_line("; ".join(parts) or content)
+
+
+def digest_summarizer(summary, turns):
+    # Local, deterministic compaction: one short line per folded turn
+    lines = [summary] if summary else []
+    for user_message, ai_message in turns:
+        lines.append(f"- Asked: {_one_line(user_message)} -> {_answer_gist(ai_message)}")
+    return "\n".join(lines)
+
+
+def make_llm_summarizer(llm):
+    def summarize(summary, turns):
+        transcript = "\n".join(
+            f"User: {user_message}\nAssistant: {ai_message}"
+            for user_message, ai_message in turns
+        )
+        prompt = (
+            "Merge the existing summary and the new exchanges into a short digest "
+            "of the user's questions, decisions and stated goals.\n\n"
+            f"Existing summary:\n{summary or '(none)'}\n\nNew exchanges:\n{transcript}"
+        )
+        return llm.invoke([HumanMessage(content=prompt)]).content
+    return summarize
+
+
+class ConversationMemory:
+    # Recent turns are kept verbatim; once the window exceeds its turn or
+    # token budget the oldest half is folded into a digest, which is itself
+    # capped, so the history sent per call never exceeds max_tokens.
+
+    def __init__(self, max_tokens=1200, summary_tokens=300, max_turns=8, summarizer=None):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turns = max_turns
+        self.summarizer = summarizer or digest_summarizer
+        self.summary = ""
+        self.turns = []
+        self.last_active = time.monotonic()
+        self._turn_tokens = []
+        self._summary_token_count = 0
+        self._lock = threading.Lock()
+
+    def add_exchange(self, user_message, ai_message):
+        with self._lock:
+            self.turns.append((user_message, ai_message))
+            self._turn_tokens.append(count_tokens(user_message) + count_tokens(ai_message))
+            self.last_active = time.monotonic()
+            self._compact()
+
+    def _compact(self):
+        while self.turns and (
+            len(self.turns) > self.max_turns or self.token_count() > self.max_tokens
+        ):
+            fold = max(1, len(self.turns) // 2)
+            folded = self.turns[:fold]
+            del self.turns[:fold]
+            del self._turn_tokens[:fold]
+
+            summary = self.summarizer(self.summary, folded)
+            if count_tokens(summary) > self.summary_tokens:
+                summary = self._trim_summary(summary)
+            self.summary = summary
+            self._summary_token_count = count_tokens(summary)
+
+    def _trim_summary(self, summary):
+        # Drop the oldest digest lines first, then hard-truncate if needed
+        lines = summary.splitlines()
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        return truncate_to_tokens("\n".join(lines), self.summary_tokens)
+
+    def token_count(self):
+        return self._summary_token_count + sum(self._turn_tokens)
+
+    @property
+    def messages(self):
+        with self._lock:
+            messages = []
+            if self.summary:
+                messages.append(SystemMessage(content=f"Earlier conversation summary:\n{self.summary}"))
+            for user_message, ai_message in self.turns:
+                messages.append(HumanMessage(content=user_message))
+                messages.append(AIMessage(content=ai_message))
+            return messages
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self.turns = []
+            self._turn_tokens = []
+            self._summary_token_count = 0
+
+
+class SessionStore:
+    # One ConversationMemory per session id, evicted after idle_ttl seconds
+    # or when more than max_sessions are live (least recently used first)
+
+    def __init__(self, idle_ttl=1800, max_sessions=1000, **memory_options):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.memory_options = memory_options
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            idle_ttl=config.SESSION_IDLE_TTL_SECONDS,
+            max_sessions=config.MAX_SESSIONS,
+            max_tokens=config.MEMORY_TOKEN_BUDGET,
+            summary_tokens=config.MEMORY_SUMMARY_TOKEN_BUDGET,
+            max_turns=config.MEMORY_MAX_TURNS
+        )
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            # Touch the requested session first so eviction never takes it
+            memory = self._sessions.get(session_id)
+            if memory is not None and now - memory.last_active > self.idle_ttl:
+                del self._sessions[session_id]
+                memory = None
+
+            if memory is None:
+                # Only a new session needs room
+                self._evict(now, room=1)
+                memory = self._sessions[session_id] = ConversationMemory(**self.memory_options)
+            else:
+                self._sessions.move_to_end(session_id)
+                self._evict(now)
+            memory.last_active = now
+            return memory
+
+    def _evict(self, now, room=0):
+        while self._sessions:
+            session_id, memory = next(iter(self._sessions.items()))
+            idle = now - memory.last_active > self.idle_ttl
+            if not idle and len(self._sessions) + room <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,240 @@
+from functools import lru_cache
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from tokens import count_tokens
+
+
+# ======================================================
+#                   STATIC SECTIONS
+# ======================================================
+
+# Kept byte-for-byte stable and always first, so providers that cache
+# prompt prefixes can reuse it across requests
+SYSTEM_PROMPT = """
+You are an AI-powered personal finance assistant.
+
+Rules:
+- Provide practical and data-driven financial advice.
+- Be structured and concise.
+- Do not guarantee investment returns.
+- Highlight risks clearly.
+- Use previous conversation context when relevant.
+- Never exceed the max recommendation score given in the risk profile.
+
+The financial context uses compact "key=value" lines. Amounts are in the
+account currency; rates are percentages.
+
+Respond ONLY in valid JSON format:
+
+{
+  "financial_assessment": "...",
+  "risk_level": "...",
+  "recommendation": "Yes / No / Cautious Yes",
+  "recommendation_score": 0-100,
+  "confidence_level": "Low / Medium / High",
+  "reasoning": ["point1", "point2", "point3"]
+}
+
+Do not include explanations outside the JSON.
+"""
+
+DECISION_PROMPT_HEADER = """
+You are a professional financial decision assistant.
+"""
+
+DECISION_PROMPT_FOOTER = """
+Provide:
+1. A short financial assessment
+2. Risk implications
+3. A clear recommendation (Yes / No / Cautious Yes)
+4. Reasoning in 3-5 bullet points
+"""
+
+
+@lru_cache(maxsize=None)
+def static_message(text):
+    return SystemMessage(content=text)
+
+
+@lru_cache(maxsize=None)
+def static_token_count(text):
+    return count_tokens(text)
+
+
+# ======================================================
+#                   COMPACT ENCODING
+# ======================================================
+
+def format_value(value):
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.6g}"
+    if isinstance(value, (list, tuple)):
+        return ",".join(format_value(item) for item in value) or "none"
+    if value is None or value == "":
+        return "n/a"
+    return str(value)
+
+
+def encode_fields(fields):
+    return " ".join(f"{key}={format_value(value)}" for key, value in fields.items())
+
+
+def financial_fields(metrics, spending=None, dashboard=None):
+    # One canonical record: each figure appears once, whichever dict it
+    # originally came from
+    fields = {
+        "income": metrics["income"],
+        "expenses": metrics["expenses"],
+        "savings": metrics["savings"],
+        "savings_rate_pct": metrics["savings_rate"],
+    }
+    if spending is not None:
+        fields["expense_ratio_pct"] = spending["expense_ratio_percent"]
+    fields["runway_days"] = metrics["runway_days"]
+    if dashboard is not None:
+        fields["runway_months"] = dashboard["runway_months"]
+        fields["burn_daily"] = dashboard["burn_rate_daily"]
+    fields["emergency_target"] = metrics["emergency_target"]
+    return fields
+
+
+def encode_categories(category_breakdown):
+    return encode_fields(category_breakdown) if category_breakdown else "none"
+
+
+def encode_periods(periods):
+    return " | ".join(
+        f"{name}: " + encode_fields({
+            "savings_rate_pct": period["savings_rate"],
+            "burn_daily": period["burn_rate_daily"],
+            "runway_months": period["runway_months"]
+        })
+        for name, period in periods.items()
+    )
+
+
+SCENARIO_AXES = {
+    "expense_shock": "shock",
+    "savings_rate_change": "save_pct_chg",
+    "income_change_pct": "income_pct_chg"
+}
+
+
+def encode_scenarios(rows):
+    # Header once, then one comma-separated cell per row; only the axes that
+    # vary are spelled out, so a one-axis sweep stays short
+    varying = [name for name in SCENARIO_AXES if len({row[name] for row in rows}) > 1]
+    outcomes = ("savings", "savings_rate", "runway_months")
+
+    def cell(names, outcome):
+        axes = ",".join(names)
+        return f"{axes}>{outcome}" if varying else outcome
+
+    header = cell(
+        [SCENARIO_AXES[name] for name in varying], "savings,savings_rate_pct,runway_months"
+    )
+    cells = [
+        cell(
+            [format_value(row[name]) for name in varying],
+            ",".join(format_value(row[name]) for name in outcomes)
+        )
+        for row in rows
+    ]
+    return " | ".join([header] + cells)
+
+
+# ======================================================
+#                   AGENT PROMPT
+# ======================================================
+
+class AgentPrompt:
+
+    def __init__(self, system_prompt, history, sections):
+        self.system_prompt = system_prompt
+        self.history = list(history)
+        self.sections = sections
+
+    @property
+    def context_text(self):
+        return "\n".join(f"{name.upper()}: {text}" for name, text in self.sections.items())
+
+    @property
+    def messages(self):
+        return [
+            static_message(self.system_prompt),
+            *self.history,
+            HumanMessage(content=self.context_text)
+        ]
+
+    def token_counts(self):
+        counts = {"system": static_token_count(self.system_prompt)}
+        counts["history"] = sum(count_tokens(message.content) for message in self.history)
+        for name, text in self.sections.items():
+            counts[name] = count_tokens(text)
+        counts["total"] = sum(counts.values())
+        return counts
+
+
+def context_sections(user_query, context):
+    risk_data = context["risk_data"]
+    sections = {
+        "goal": context["profile"].get("goal", "Not specified"),
+        "financials": encode_fields(financial_fields(
+            context["metrics"], context.get("spending"), context.get("dashboard")
+        )),
+        "status": encode_fields({
+            "risk": context["spending"]["risk_score"],
+            "flags": context["flags"],
+            "confidence": context["confidence"]
+        }),
+        "categories": encode_categories(context["spending"]["category_breakdown"]),
+    }
+
+    if context.get("periods"):
+        sections["periods"] = encode_periods(context["periods"])
+
+    sections["risk_profile"] = encode_fields({
+        "mode": risk_data["profile"],
+        "max_score": risk_data["max_recommendation_score"],
+        "tone": risk_data["tone"]
+    })
+
+    if context.get("scenarios"):
+        sections["scenarios"] = encode_scenarios(context["scenarios"])
+
+    retrieved = context.get("retrieved") or {}
+    if retrieved.get("transactions"):
+        sections["relevant_transactions"] = " | ".join(retrieved["transactions"])
+    if retrieved.get("policies"):
+        sections["policies"] = " | ".join(retrieved["policies"])
+
+    # The question goes last so everything above it is shared between
+    # questions asked against the same financial state
+    sections["question"] = user_query
+    return sections
+
+
+def build_agent_prompt(user_query, context, history=()):
+    return AgentPrompt(SYSTEM_PROMPT, history, context_sections(user_query, context))
+
+
+# ======================================================
+#                   DECISION PROMPT
+# ======================================================
+
+def build_decision_prompt_text(metrics, spending, risk_level, profile,
+                               scenario=None, question=None):
+    lines = [
+        DECISION_PROMPT_HEADER,
+        "FINANCIALS: " + encode_fields(financial_fields(metrics, spending)),
+        f"RISK LEVEL: {risk_level}",
+        "CATEGORIES: " + encode_categories(spending["category_breakdown"]),
+        "PROFILE: " + encode_fields(profile),
+    ]
+    if scenario:
+        lines.append("SCENARIO: " + encode_fields(scenario))
+    if question:
+        lines.append(f"QUESTION: {question}")
+    lines.append(DECISION_PROMPT_FOOTER)
+    return "\n".join(lines)
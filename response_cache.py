@@ -0,0 +1,154 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_PUNCTUATION = re.compile(r"[^\w\s$%.]|(?<!\d)\.|\.(?!\d)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    # Case, spacing and punctuation differences should hit the same entry;
+    # decimal points and currency/percent signs are kept since they carry meaning
+    query = _THOUSANDS.sub("", query.lower())
+    query = _PUNCTUATION.sub(" ", query)
+    return _SPACES.sub(" ", query).strip()
+
+
+def state_fingerprint(state):
+    encoded = json.dumps(state, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(system_prompt, user_query, risk_mode, state):
+    parts = [
+        hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+        normalize_query(user_query),
+        risk_mode,
+        state_fingerprint(state)
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheBackend:
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        return json.loads(value), expires_at
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+class ResponseCache:
+    # In-memory LRU with a per-entry TTL, optionally backed by SQLite so
+    # entries survive restarts and are shared between worker processes
+
+    def __init__(self, max_entries=512, ttl_seconds=900, backend=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        backend = None
+        if config.RESPONSE_CACHE_PATH:
+            backend = SQLiteCacheBackend(config.RESPONSE_CACHE_PATH)
+        return cls(
+            max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.RESPONSE_CACHE_TTL_SECONDS,
+            backend=backend
+        )
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        stored = self.backend.get(key) if self.backend is not None else None
+
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, *stored)
+            return stored[0]
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.backend is not None:
+            self.backend.set(key, value, expires_at)
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache.from_config()
@@ -0,0 +1,279 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+from banking_data import (
+    TYPE_CREDIT,
+    TYPE_DEBIT,
+    calculate_financial_metrics,
+    get_ledger_snapshot
+)
+
+
+# Below this many months of history the sample spread is noise, so each
+# category falls back to a fixed coefficient of variation
+MIN_HISTORY_MONTHS = 3
+DEFAULT_SPEND_CV = 0.25
+DEFAULT_INCOME_CV = 0.05
+
+DEFAULT_PATHS = 10000
+DEFAULT_MONTHS = 24
+DEFAULT_SEED = 42
+RUNWAY_PERCENTILES = (5, 50, 95)
+
+
+# ======================================================
+#                   SPENDING MODEL
+# ======================================================
+
+class SpendingModel:
+    # Monthly spend per category as a lognormal fitted to the ledger's
+    # history, plus monthly income as a clipped normal
+
+    def __init__(self, categories, spend_mean, spend_std, income_mean, income_std,
+                 starting_balance, history_months):
+        self.categories = categories
+        self.spend_mean = spend_mean
+        self.spend_std = spend_std
+        self.income_mean = income_mean
+        self.income_std = income_std
+        self.starting_balance = starting_balance
+        self.history_months = history_months
+
+        # Moment-matched lognormal parameters, float32 to halve draw cost
+        cv2 = np.divide(
+            spend_std ** 2, spend_mean ** 2,
+            out=np.zeros_like(spend_mean), where=spend_mean > 0
+        )
+        sigma2 = np.log1p(cv2)
+        self.log_sigma = np.sqrt(sigma2).astype(np.float32)
+        self.log_mu = (
+            np.log(np.maximum(spend_mean, 1e-9)) - sigma2 / 2
+        ).astype(np.float32)
+        self.active = spend_mean > 0
+
+    @property
+    def monthly_spend(self):
+        return float(self.spend_mean.sum())
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        index = snapshot.date_index
+        categories = index.categories
+        n = len(categories)
+
+        dated = ~np.isnat(index.dates)
+        months = index.dates[dated].astype("datetime64[M]")
+        amounts = index.amounts[dated]
+        types = index.types[dated]
+        codes = index.category_codes[dated]
+
+        if len(months):
+            first = months[0]
+            month_ids = (months - first).astype(np.int64)
+            n_months = int(month_ids[-1]) + 1
+        else:
+            month_ids = np.zeros(0, dtype=np.int64)
+            n_months = 0
+
+        if n_months:
+            debit = types == TYPE_DEBIT
+            grid = np.bincount(
+                month_ids[debit] * n + codes[debit],
+                weights=amounts[debit],
+                minlength=n_months * n
+            ).reshape(n_months, n)
+
+            credit = types == TYPE_CREDIT
+            income = np.bincount(
+                month_ids[credit], weights=amounts[credit], minlength=n_months
+            )
+        else:
+            # Undated ledger: treat the whole thing as one month
+            grid = np.zeros((1, n))
+            debit = snapshot.columns.types == TYPE_DEBIT
+            np.add.at(
+                grid[0], snapshot.columns.category_codes[debit],
+                snapshot.columns.amounts[debit]
+            )
+            income = np.array([float(snapshot.total_income)])
+
+        spend_mean = grid.mean(axis=0)
+        income_mean = float(income.mean())
+        if len(grid) >= MIN_HISTORY_MONTHS:
+            spend_std = grid.std(axis=0, ddof=1)
+            income_std = float(income.std(ddof=1))
+        else:
+            spend_std = spend_mean * DEFAULT_SPEND_CV
+            income_std = income_mean * DEFAULT_INCOME_CV
+
+        return cls(
+            categories, spend_mean, spend_std, income_mean, income_std,
+            float(snapshot.savings), len(grid)
+        )
+
+
+# LRU-bounded per account, like the ledger snapshots it is built from
+_model_lock = threading.Lock()
+_model_cache = OrderedDict()
+
+
+def get_spending_model(account_id=None):
+    snapshot = get_ledger_snapshot(account_id)
+    key = account_id or "default"
+
+    with _model_lock:
+        cached = _model_cache.get(key)
+        if cached is not None and cached[0] == snapshot.fingerprint:
+            _model_cache.move_to_end(key)
+            return cached[1]
+
+    model = SpendingModel.from_snapshot(snapshot)
+    with _model_lock:
+        _model_cache[key] = (snapshot.fingerprint, model)
+        _model_cache.move_to_end(key)
+        while len(_model_cache) > config.LEDGER_CACHE_MAX_ACCOUNTS:
+            _model_cache.popitem(last=False)
+    return model
+
+
+# ======================================================
+#                   MONTE CARLO
+# ======================================================
+
+def simulate_paths(model, expense_shock=0, months=DEFAULT_MONTHS, paths=DEFAULT_PATHS,
+                   seed=DEFAULT_SEED, with_income=False):
+    # Balance after each simulated month, shape (paths, months)
+    rng = np.random.default_rng(seed)
+    active = model.active
+
+    z = rng.standard_normal((paths, months, int(active.sum())), dtype=np.float32)
+    z *= model.log_sigma[active]
+    z += model.log_mu[active]
+    np.exp(z, out=z)
+    outflow = z.sum(axis=2, dtype=np.float64)
+
+    if with_income and model.income_mean > 0:
+        income = rng.normal(model.income_mean, model.income_std, (paths, months))
+        outflow -= np.maximum(income, 0.0)
+
+    balance = np.cumsum(outflow, axis=1)
+    np.subtract(model.starting_balance - expense_shock, balance, out=balance)
+    return balance, outflow
+
+
+def runway_from_paths(balance, outflow, starting_balance):
+    # Months until the balance first goes negative, interpolated within the
+    # month it happens; paths that never run out are censored at the horizon
+    paths, months = balance.shape
+    negative = balance < 0
+    ran_out = negative.any(axis=1)
+    first = np.where(ran_out, negative.argmax(axis=1), months)
+
+    rows = np.arange(paths)
+    idx = np.minimum(first, months - 1)
+    before = np.where(idx > 0, balance[rows, np.maximum(idx - 1, 0)], starting_balance)
+    burn = outflow[rows, idx]
+    fraction = np.clip(
+        np.divide(before, burn, out=np.zeros(paths), where=burn > 0), 0.0, 1.0
+    )
+
+    runway = np.where(ran_out, first + fraction, float(months))
+    runway[ran_out & (first == 0) & (starting_balance <= 0)] = 0.0
+    return runway, ran_out, first
+
+
+def simulate_runway(expense_shock=0, months=DEFAULT_MONTHS, paths=DEFAULT_PATHS,
+                    seed=DEFAULT_SEED, with_income=False, account_id=None,
+                    percentiles=RUNWAY_PERCENTILES, model=None):
+    model = model or get_spending_model(account_id)
+    starting_balance = model.starting_balance - expense_shock
+
+    balance, outflow = simulate_paths(
+        model, expense_shock, months, paths, seed, with_income
+    )
+    runway, ran_out, first = runway_from_paths(balance, outflow, starting_balance)
+
+    runway_pct = np.percentile(runway, percentiles)
+    balance_pct = np.percentile(balance, percentiles, axis=0)
+    shortfall_by_month = np.cumsum(
+        np.bincount(first[ran_out], minlength=months)[:months]
+    ) / paths
+
+    return {
+        "paths": paths,
+        "months": months,
+        "seed": seed,
+        "with_income": with_income,
+        "expense_shock": expense_shock,
+        "starting_balance": round(starting_balance, 2),
+        "expected_monthly_spend": round(model.monthly_spend, 2),
+        "runway_months": {
+            f"p{p}": round(float(v), 2) for p, v in zip(percentiles, runway_pct)
+        },
+        "runway_censored": bool((runway_pct >= months).any()),
+        "shortfall_probability": round(float(ran_out.mean()), 4),
+        "shortfall_by_month": [round(float(v), 4) for v in shortfall_by_month],
+        "balance_bands": {
+            f"p{p}": np.round(band, 2).tolist()
+            for p, band in zip(percentiles, balance_pct)
+        }
+    }
+
+
+# ======================================================
+#                   SCENARIO GRID
+# ======================================================
+
+def scenario_grid(expense_shocks=(0,), savings_rate_changes=(0,), income_changes=(0,),
+                  account_id=None, metrics=None):
+    # Every combination of one-off expense, savings-rate change (percentage
+    # points of income) and income change (percent), evaluated by
+    # broadcasting over a single metrics snapshot. Result arrays have shape
+    # (len(expense_shocks), len(savings_rate_changes), len(income_changes)).
+    metrics = metrics or calculate_financial_metrics(account_id)
+
+    shocks = np.asarray(expense_shocks, dtype=np.float64).reshape(-1, 1, 1)
+    rate_changes = np.asarray(savings_rate_changes, dtype=np.float64).reshape(1, -1, 1)
+    income_changes = np.asarray(income_changes, dtype=np.float64).reshape(1, 1, -1)
+
+    income = metrics["income"] * (1 + income_changes / 100)
+    expenses = np.maximum(metrics["expenses"] - income * rate_changes / 100, 0.0)
+    savings = income - expenses - shocks
+
+    savings_rate = np.divide(
+        savings * 100, income, out=np.zeros_like(savings), where=income != 0
+    )
+    runway_months = np.divide(
+        savings, expenses, out=np.zeros_like(savings), where=expenses != 0
+    )
+    shape = savings.shape
+
+    return {
+        "expense_shocks": shocks.ravel().tolist(),
+        "savings_rate_changes": rate_changes.ravel().tolist(),
+        "income_changes": income_changes.ravel().tolist(),
+        "income": np.broadcast_to(income, shape),
+        "expenses": np.broadcast_to(expenses, shape),
+        "savings": savings,
+        "savings_rate": np.round(savings_rate, 2),
+        "runway_months": np.round(runway_months, 2),
+        "shortfall": savings < 0
+    }
+
+
+def grid_rows(grid):
+    # Flat records, one per grid cell, for tables and JSON
+    rows = []
+    for (i, j, k), savings in np.ndenumerate(grid["savings"]):
+        rows.append({
+            "expense_shock": grid["expense_shocks"][i],
+            "savings_rate_change": grid["savings_rate_changes"][j],
+            "income_change_pct": grid["income_changes"][k],
+            "savings": round(float(savings), 2),
+            "savings_rate": float(grid["savings_rate"][i, j, k]),
+            "runway_months": float(grid["runway_months"][i, j, k])
+        })
+    return rows
@@ -0,0 +1,224 @@
+import json
+import re
+
+
+# The agent's response schema. Only the decision itself is required; the
+# other fields are normalized when present.
+REQUIRED_FIELDS = ("recommendation", "recommendation_score")
+
+RECOMMENDATIONS = ("Yes", "No", "Cautious Yes")
+CONFIDENCE_LEVELS = ("Low", "Medium", "High")
+
+_FENCE = re.compile(r"```[a-zA-Z]*")
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_DOUBLE_COMMA = re.compile(r",(\s*,)+")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_DANGLING_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"$')
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_RECOMMENDATION = re.compile(r"\s*(cautious\s+yes|yes|no)\b", re.I)
+_ALTERNATIVE = re.compile(r"\s*(?:/|\||or\b)", re.I)
+_RECOMMENDATION_LABELS = {label.lower(): label for label in RECOMMENDATIONS}
+
+
+# ======================================================
+#                   EXTRACTION / REPAIR
+# ======================================================
+
+def extract_json_object(text, start=0):
+    # The first balanced {...} at or after `start`, ignoring braces inside
+    # strings. Output cut off mid-object is closed off so the fields that
+    # did arrive can still be used.
+    start = text.find("{", start)
+    if start == -1:
+        return None
+
+    closers = []
+    in_string = False
+    escape = False
+
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if closers:
+                closers.pop()
+            if not closers:
+                return text[start:i + 1]
+
+    # Truncated: finish the open string, drop a key left without a value,
+    # and close the open containers
+    tail = text[start:]
+    if in_string:
+        tail += '"'
+    tail = tail.rstrip().rstrip(":").rstrip()
+    if closers[-1] == "}":
+        tail = _DANGLING_KEY.sub(r"\1", tail)
+    tail = tail.rstrip().rstrip(",")
+    return tail + "".join(reversed(closers))
+
+
+def _json_candidates(text):
+    # extract_json_object from each "{" in turn, for prose such as
+    # "Based on {income}: {...}" ahead of the real object
+    start = text.find("{")
+    while start != -1:
+        yield extract_json_object(text, start)
+        start = text.find("{", start + 1)
+
+
+def _outside_strings(text, fix):
+    # Applies `fix` to the parts of the JSON text that are not string literals
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', text)
+    return "".join(
+        part if i % 2 else fix(part)
+        for i, part in enumerate(parts)
+    )
+
+
+def _fix_bare(segment):
+    segment = _DOUBLE_COMMA.sub(",", segment)
+    segment = _TRAILING_COMMA.sub(r"\1", segment)
+    return re.sub(r"\b(True|False|None)\b", lambda m: _LITERALS[m.group(1)], segment)
+
+
+def repair_json(text):
+    # Common model defects: markdown fences, curly quotes, trailing and
+    # doubled commas, Python literals
+    # Curly quotes only delimit strings outside existing literals; inside
+    # one they are text ("a “big” buy")
+    text = _outside_strings(_FENCE.sub("", text), lambda part: part.translate(_SMART_QUOTES))
+    return _outside_strings(text, _fix_bare)
+
+
+def load_json_object(content):
+    # Returns (object, problems); object is None when nothing parseable was
+    # found
+    content = content or ""
+    try:
+        # strict=False accepts raw newlines and tabs inside strings, which
+        # models emit in long free-text fields
+        parsed = json.loads(content, strict=False)
+        if isinstance(parsed, dict):
+            return parsed, []
+    except json.JSONDecodeError:
+        pass
+
+    candidates = list(_json_candidates(content)) or list(_json_candidates(repair_json(content)))
+    if not candidates:
+        return None, ["no JSON object in output"]
+
+    error = None
+    for candidate in candidates:
+        for attempt in (candidate, repair_json(candidate)):
+            try:
+                parsed = json.loads(attempt, strict=False)
+            except json.JSONDecodeError as e:
+                error = error or str(e)
+                continue
+            if isinstance(parsed, dict):
+                return parsed, []
+    return None, [f"unparseable JSON: {error or 'not a JSON object'}"]
+
+
+# ======================================================
+#                   VALIDATION
+# ======================================================
+
+def _recommendation(value):
+    # The leading token decides, exactly; "Cautious No" and an echoed
+    # "Yes / No / Cautious Yes" template are rejected rather than guessed
+    match = _RECOMMENDATION.match(str(value))
+    if match is None or _ALTERNATIVE.match(str(value), match.end()):
+        raise ValueError(f"recommendation must be one of {RECOMMENDATIONS}")
+    return _RECOMMENDATION_LABELS[" ".join(match.group(1).lower().split())]
+
+
+def _score(value, max_score):
+    if isinstance(value, bool):
+        raise ValueError("recommendation_score must be a number")
+    if not isinstance(value, (int, float)):
+        # "75", "75/100", "75%"
+        match = _NUMBER.search(str(value))
+        if match is None:
+            raise ValueError("recommendation_score must be a number")
+        value = float(match.group())
+    return int(round(min(max(value, 0), max_score)))
+
+
+def _confidence(value):
+    text = str(value).strip().lower()
+    for level in CONFIDENCE_LEVELS:
+        if text.startswith(level.lower()):
+            return level
+    raise ValueError(f"confidence_level must be one of {CONFIDENCE_LEVELS}")
+
+
+def _reasoning(value):
+    if isinstance(value, str):
+        value = [line for line in value.splitlines() if line.strip()] or [value]
+    if not isinstance(value, list):
+        raise ValueError("reasoning must be a list")
+    return [_BULLET.sub("", str(item)).strip() for item in value if str(item).strip()]
+
+
+def _text(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value).strip()
+
+
+def validate_field(name, value, max_score=100):
+    # Normalized value for one response field; raises ValueError when it
+    # cannot be coerced. Unknown fields pass through unchanged.
+    if name == "recommendation":
+        return _recommendation(value)
+    if name == "recommendation_score":
+        return _score(value, max_score)
+    if name == "confidence_level":
+        return _confidence(value)
+    if name == "reasoning":
+        return _reasoning(value)
+    if name in ("financial_assessment", "risk_level"):
+        return _text(value)
+    return value
+
+
+def parse_structured_response(content, max_score=100):
+    parsed, problems = load_json_object(content)
+    if parsed is None:
+        return {
+            "error": "Model did not return valid JSON",
+            "problems": problems,
+            "raw_response": content
+        }
+
+    response = {}
+    for name, value in parsed.items():
+        try:
+            response[name] = validate_field(name, value, max_score)
+        except ValueError as e:
+            problems.append(str(e))
+
+    missing = [name for name in REQUIRED_FIELDS if name not in response]
+    if missing:
+        problems.append("missing " + ", ".join(missing))
+        return {
+            "error": "Model response failed validation",
+            "problems": problems,
+            "raw_response": content
+        }
+    return response
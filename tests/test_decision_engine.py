@@ -0,0 +1,40 @@
+import pytest
+
+from decision_engine import AFFORDABILITY
+from decision_engine import SAVINGS_INCREASE
+from decision_engine import classify_question
+
+
+@pytest.mark.parametrize("question, percent", [
+    ("Can I save 10% more of my income?", 10),
+    ("Should I save an extra 15 percent each month?", 15),
+    ("How do I increase my savings rate by 5%?", 5),
+])
+def test_explicit_savings_increase(question, percent):
+    assert classify_question(question) == {"intent": SAVINGS_INCREASE, "percent": percent}
+
+
+@pytest.mark.parametrize("question", [
+    "Should I move 50% of my savings into crypto?",
+    "Is it wise to invest 20% of my savings in stocks?",
+    "I lost 10% of my savings last month",
+    "What share of my income goes to savings, 20%?",
+])
+def test_other_savings_questions_go_to_the_model(question):
+    assert classify_question(question)["intent"] is None
+
+
+@pytest.mark.parametrize("question", [
+    "Can I afford rent of 1500 per month?",
+    "Can I afford a 2000/month car lease?",
+    "Can I afford a monthly gym membership of 3000?",
+    "What was my spending over the last 30 days?",
+])
+def test_recurring_and_spending_questions_go_to_the_model(question):
+    assert classify_question(question)["intent"] is None
+
+
+def test_one_off_purchase_is_fast_pathed():
+    assert classify_question("Can I afford to buy a laptop for ₹80,000?") == {
+        "intent": AFFORDABILITY, "amount": 80000
+    }
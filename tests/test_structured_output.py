@@ -0,0 +1,66 @@
+import pytest
+
+from json_stream import IncrementalJSONParser
+from structured_output import load_json_object
+from structured_output import parse_structured_response
+from structured_output import validate_field
+
+
+RAW_NEWLINE = (
+    '{"financial_assessment": "Spending is high.\nSavings are thin.",'
+    ' "recommendation": "No", "recommendation_score": 30,'
+    ' "reasoning": ["Expenses\texceed income"]}'
+)
+
+
+def test_raw_control_characters_in_strings_are_accepted():
+    parsed, problems = load_json_object(RAW_NEWLINE)
+    assert problems == []
+    assert parsed["financial_assessment"] == "Spending is high.\nSavings are thin."
+
+
+def test_raw_newline_survives_repair_path():
+    # Fenced and trailing-comma output goes through repair_json as well
+    content = "```json\n" + RAW_NEWLINE[:-1] + ",}\n```"
+    response = parse_structured_response(content)
+    assert "error" not in response
+    assert response["recommendation"] == "No"
+    assert response["recommendation_score"] == 30
+    assert response["reasoning"] == ["Expenses\texceed income"]
+
+
+def test_stream_parser_decodes_raw_newlines():
+    parser = IncrementalJSONParser()
+    fields = dict(parser.feed(RAW_NEWLINE))
+    assert fields["financial_assessment"] == "Spending is high.\nSavings are thin."
+
+
+def test_recommendation_matches_the_leading_token_only():
+    assert validate_field("recommendation", "No - take a cautious approach") == "No"
+    assert validate_field("recommendation", "cautious  yes.") == "Cautious Yes"
+    assert validate_field("recommendation", "Yes, within budget") == "Yes"
+    for value in ("Cautious No", "Yes / No / Cautious Yes", "Yes or No", "Maybe"):
+        with pytest.raises(ValueError):
+            validate_field("recommendation", value)
+
+
+def test_curly_quotes_inside_strings_are_kept():
+    content = (
+        'Sure! {"recommendation": "No", "recommendation_score": 20, '
+        '"financial_assessment": "a “big” buy",}'
+    )
+    response = parse_structured_response(content)
+    assert "error" not in response
+    assert response["financial_assessment"] == "a “big” buy"
+
+
+def test_curly_quoted_keys_are_still_repaired():
+    response = parse_structured_response('{“recommendation”: “Yes”, “recommendation_score”: 75}')
+    assert response == {"recommendation": "Yes", "recommendation_score": 75}
+
+
+def test_braces_in_prose_before_the_object_are_skipped():
+    response = parse_structured_response(
+        'Based on {income}: {"recommendation": "Yes", "recommendation_score": 70}'
+    )
+    assert response == {"recommendation": "Yes", "recommendation_score": 70}
@@ -0,0 +1,295 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import config
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_PREFIX = "ambient"
+
+_current = contextvars.ContextVar("ambient_trace", default=None)
+
+
+# ======================================================
+#                   TRACES
+# ======================================================
+
+class Trace:
+    # One request: named spans (offset and duration from the request start),
+    # counters and free-form attributes
+
+    __slots__ = ("trace_id", "name", "attributes", "counters", "spans",
+                 "started_at", "_start", "duration")
+
+    def __init__(self, name, **attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = attributes
+        self.counters = {}
+        self.spans = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def add_span(self, name, start, end):
+        self.spans.append((name, start - self._start, end - start))
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def incr(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": round(self.started_at, 6),
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "counters": self.counters,
+            "spans": [
+                {"name": name, "offset": round(offset, 6), "duration": round(duration, 6)}
+                for name, offset, duration in self.spans
+            ]
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add_span(self.name, self.start, time.perf_counter())
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+# ======================================================
+#                   RECORDER
+# ======================================================
+
+class Histogram:
+
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class TraceRecorder:
+    # Process-wide aggregates (counters, per-stage latency histograms), a
+    # ring buffer of recent traces, and an optional JSON-lines sink
+
+    def __init__(self, max_traces=1000, path=None, enabled=True):
+        self.enabled = enabled
+        self.path = path
+        self.traces = deque(maxlen=max_traces)
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            max_traces=config.TRACE_BUFFER_SIZE,
+            path=config.TRACE_LOG_PATH,
+            enabled=config.TRACING_ENABLED
+        )
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds, label="stage"):
+        key = (label, name)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def record(self, trace):
+        with self._lock:
+            self.traces.append(trace)
+            request = self.histograms.get(("request", trace.name))
+            if request is None:
+                request = self.histograms[("request", trace.name)] = Histogram()
+            request.observe(trace.duration)
+
+            for name, _, duration in trace.spans:
+                stage = self.histograms.get(("stage", name))
+                if stage is None:
+                    stage = self.histograms[("stage", name)] = Histogram()
+                stage.observe(duration)
+
+            if self.path:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(json.dumps(trace.to_dict(), default=str) + "\n")
+
+    def recent(self, limit=None):
+        with self._lock:
+            traces = list(self.traces)
+        if limit is not None:
+            traces = traces[-limit:]
+        return [trace.to_dict() for trace in traces]
+
+    def export_jsonl(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for record in self.recent():
+                file.write(json.dumps(record, default=str) + "\n")
+        return path
+
+    def prometheus_text(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {
+                key: (list(h.buckets), h.count, h.sum)
+                for key, h in self.histograms.items()
+            }
+
+        lines = []
+        for name in sorted(counters):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {counters[name]}")
+
+        for label in sorted({label for label, _ in histograms}):
+            metric = f"{METRIC_PREFIX}_{label}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for (kind, name), (buckets, count, total) in sorted(histograms.items()):
+                if kind != label:
+                    continue
+                cumulative = 0
+                for bound, hits in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                    cumulative += hits
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {total:.6f}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {count}')
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.traces.clear()
+            self.counters.clear()
+            self.histograms.clear()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+recorder = TraceRecorder.from_config()
+
+
+# ======================================================
+#                   API
+# ======================================================
+
+def start_trace(name, **attributes):
+    return Trace(name, **attributes) if recorder.enabled else None
+
+
+def finish_trace(trace):
+    if trace is None or trace.duration is not None:
+        return
+    trace.duration = time.perf_counter() - trace._start
+    recorder.record(trace)
+
+
+@contextlib.contextmanager
+def activate(trace):
+    # Makes `trace` the target of span()/incr()/annotate() in this context
+    # (and in threads started from it with asyncio.to_thread)
+    if trace is None:
+        yield None
+        return
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def trace(name, **attributes):
+    current = start_trace(name, **attributes)
+    try:
+        with activate(current):
+            yield current
+    finally:
+        finish_trace(current)
+
+
+def current_trace():
+    return _current.get()
+
+
+def span(name):
+    current = _current.get()
+    if current is None:
+        return _NULL_SPAN
+    return _Span(current, name)
+
+
+def incr(name, value=1):
+    if not recorder.enabled:
+        return
+    recorder.incr(name, value)
+    current = _current.get()
+    if current is not None:
+        current.incr(name, value)
+
+
+def annotate(**attributes):
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def observe(name, seconds, label="stage"):
+    if recorder.enabled:
+        recorder.observe(name, seconds, label)
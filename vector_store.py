@@ -0,0 +1,486 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from banking_data import DATA_DIR
+from banking_data import TransactionStream
+from banking_data import file_fingerprint
+from banking_data import get_account
+from banking_data import ledger_offset_is_valid
+from banking_data import ledger_window_digest
+
+import config
+
+
+POLICIES_PATH = os.path.join(DATA_DIR, "policies.txt")
+EMBEDDING_DIM = 512
+MIN_SIMILARITY = 0.1
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+# ======================================================
+#                   EMBEDDINGS
+# ======================================================
+
+class HashingEmbedder:
+    # Local feature-hashing embedder over words and character trigrams. No
+    # model download or network call, and the same text always maps to the
+    # same vector, so persisted indexes stay valid across restarts.
+
+    # Ledger text repeats the same few hundred words, so each word's hashed
+    # features are computed once and reused
+    MAX_CACHED_WORDS = 200_000
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+        self._word_features = {}
+
+    def _hash(self, feature):
+        digest = zlib.crc32(feature.encode("utf-8"))
+        return digest % self.dim, 1.0 if digest & 0x80000000 else -1.0
+
+    def _features(self, word):
+        # (columns, signs) for the word itself and its character trigrams
+        cached = self._word_features.get(word)
+        if cached is None:
+            padded = f"#{word}#"
+            features = [word] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+            hashed = [self._hash(feature) for feature in features]
+            cached = ([column for column, _ in hashed], [sign for _, sign in hashed])
+            if len(self._word_features) >= self.MAX_CACHED_WORDS:
+                self._word_features.clear()
+            self._word_features[word] = cached
+        return cached
+
+    def embed(self, texts):
+        # Flat (row * dim + column) cells and signs, summed with one bincount
+        cells = []
+        signs = []
+        for row, text in enumerate(texts):
+            offset = row * self.dim
+            for word in _WORD.findall(text.lower()):
+                word_columns, word_signs = self._features(word)
+                cells.extend([offset + column for column in word_columns])
+                signs.extend(word_signs)
+
+        vectors = np.bincount(
+            np.array(cells, dtype=np.intp),
+            weights=np.array(signs, dtype=np.float64),
+            minlength=len(texts) * self.dim
+        ).astype(np.float32).reshape(len(texts), self.dim)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+# ======================================================
+#                   INDEX
+# ======================================================
+
+class VectorIndex:
+    # Brute-force cosine index: one matrix product per query, which stays
+    # well under a millisecond up to ~100k documents at 512 dimensions.
+    # Vectors live in a buffer that grows geometrically, so adding a ledger
+    # batch by batch is linear rather than a copy per batch.
+    #
+    # On disk an index is three files next to `path`: .f32 holds the raw
+    # vectors, .jsonl one [id, text, kind] line per row, and .json a header
+    # with the row count, the documents' byte length and meta. persist()
+    # appends only the rows added since the last write and then replaces the
+    # header, so rows past the header's count (an interrupted append) are
+    # ignored on load and overwritten by the next append.
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._codes = np.zeros(0, dtype=np.int16)
+        self._size = 0
+        self.ids = []
+        self.texts = []
+        self.kinds = []
+        self.kind_codes = {}
+        self._kind_rows = {}
+        self.meta = {}
+        self._id_set = set()
+        # (rows, documents bytes) already on disk; None forces a full write
+        self._persisted = None
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, doc_id):
+        return doc_id in self._id_set
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._size]
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self.vectors
+        codes = np.empty(capacity, dtype=np.int16)
+        codes[:self._size] = self._codes[:self._size]
+        self._vectors = vectors
+        self._codes = codes
+
+    def _kind_code(self, kind):
+        return self.kind_codes.setdefault(kind, len(self.kind_codes))
+
+    def add(self, doc_ids, texts, kind, vectors):
+        keep = [i for i, doc_id in enumerate(doc_ids) if doc_id not in self._id_set]
+        if not keep:
+            return 0
+
+        count = len(keep)
+        self._reserve(count)
+        self._vectors[self._size:self._size + count] = vectors[keep]
+        self._codes[self._size:self._size + count] = self._kind_code(kind)
+        for i in keep:
+            self.ids.append(doc_ids[i])
+            self.texts.append(texts[i])
+            self.kinds.append(kind)
+            self._id_set.add(doc_ids[i])
+        self._size += count
+        self._kind_rows.clear()
+        return count
+
+    def remove_kind(self, kind):
+        code = self.kind_codes.get(kind)
+        if code is None:
+            return
+        keep = np.flatnonzero(self._codes[:self._size] != code)
+        self._vectors = self.vectors[keep]
+        self._codes = self._codes[keep]
+        self._size = len(keep)
+        self._kind_rows.clear()
+        self._persisted = None
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.kinds = [self.kinds[i] for i in keep]
+        self._id_set = set(self.ids)
+
+    def _rows(self, kind):
+        # Row numbers of one kind, cached until the index changes
+        rows = self._kind_rows.get(kind)
+        if rows is None:
+            code = self.kind_codes.get(kind)
+            rows = np.zeros(0, dtype=np.intp) if code is None else np.flatnonzero(
+                self._codes[:self._size] == code
+            )
+            self._kind_rows[kind] = rows
+        return rows
+
+    def search(self, query_vector, k=5, kind=None, min_similarity=MIN_SIMILARITY):
+        if not len(self):
+            return []
+
+        rows = None
+        if kind is None:
+            scores = self.vectors @ query_vector
+        else:
+            rows = self._rows(kind)
+            if not len(rows):
+                return []
+            if 2 * len(rows) < self._size:
+                # A minority kind (policies next to a whole ledger): score
+                # only its rows
+                scores = self._vectors[rows] @ query_vector
+            else:
+                rows = None
+                scores = self.vectors @ query_vector
+                scores[self._codes[:self._size] != self.kind_codes[kind]] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = top if rows is None else rows[top]
+
+        return [
+            {"id": self.ids[i], "text": self.texts[i], "kind": self.kinds[i], "score": score}
+            for i, score in zip(positions.tolist(), scores[top].tolist())
+            if score >= min_similarity
+        ]
+
+    @staticmethod
+    def _files(path):
+        return path + ".f32", path + ".jsonl", path + ".json"
+
+    def _document_lines(self, start):
+        return b"".join(
+            (json.dumps([self.ids[i], self.texts[i], self.kinds[i]]) + "\n").encode("utf-8")
+            for i in range(start, self._size)
+        )
+
+    def _write_header(self, path, documents_bytes):
+        header_path = self._files(path)[2]
+        tmp_path = header_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({
+                "dim": self.dim,
+                "rows": self._size,
+                "documents_bytes": documents_bytes,
+                "meta": self.meta
+            }, file)
+        os.replace(tmp_path, header_path)
+        self._persisted = (self._size, documents_bytes)
+
+    def save(self, path):
+        vectors_path, documents_path, header_path = self._files(path)
+        # Without a header the other two files are ignored, so a crash
+        # mid-rewrite leaves no half-written index behind
+        if os.path.exists(header_path):
+            os.remove(header_path)
+        with open(vectors_path, "wb") as file:
+            self.vectors.tofile(file)
+        with open(documents_path, "wb") as file:
+            file.write(self._document_lines(0))
+            documents_bytes = file.tell()
+        self._write_header(path, documents_bytes)
+
+    def persist(self, path):
+        if self._persisted is None:
+            return self.save(path)
+
+        rows, documents_bytes = self._persisted
+        vectors_path, documents_path, _ = self._files(path)
+        try:
+            with open(vectors_path, "r+b") as file:
+                file.seek(rows * self.dim * 4)
+                file.truncate()
+                file.write(self._vectors[rows:self._size].tobytes())
+            with open(documents_path, "r+b") as file:
+                file.seek(documents_bytes)
+                file.truncate()
+                file.write(self._document_lines(rows))
+                documents_bytes = file.tell()
+        except FileNotFoundError:
+            return self.save(path)
+        self._write_header(path, documents_bytes)
+
+    @classmethod
+    def load(cls, path, dim=EMBEDDING_DIM):
+        index = cls(dim)
+        vectors_path, documents_path, header_path = cls._files(path)
+        try:
+            with open(header_path, "r") as file:
+                header = json.load(file)
+            if header["dim"] != dim:
+                return index
+            rows = header["rows"]
+            vectors = np.fromfile(vectors_path, dtype=np.float32, count=rows * dim)
+            with open(documents_path, "rb") as file:
+                lines = file.read(header["documents_bytes"]).splitlines()
+        except (OSError, ValueError, KeyError):
+            return index
+        if len(vectors) != rows * dim or len(lines) != rows:
+            return index
+
+        documents = [json.loads(line) for line in lines]
+        index._vectors = vectors.reshape(rows, dim)
+        index._size = rows
+        index.ids = [doc_id for doc_id, _, _ in documents]
+        index.texts = [text for _, text, _ in documents]
+        index.kinds = [kind for _, _, kind in documents]
+        index._codes = np.array(
+            [index._kind_code(kind) for kind in index.kinds], dtype=np.int16
+        )
+        index.meta = header["meta"]
+        index._id_set = set(index.ids)
+        index._persisted = (rows, header["documents_bytes"])
+        return index
+
+
+# ======================================================
+#                   DOCUMENTS
+# ======================================================
+
+def transaction_text(txn):
+    return (
+        f"{txn.get('date', '')} {txn['type']} {txn['amount']} "
+        f"{txn.get('category', '')}: {txn.get('description', '')}"
+    )
+
+
+def load_policy_snippets(path=POLICIES_PATH):
+    # Policies are plain text; blank lines separate snippets
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        content = file.read()
+    return [snippet.strip() for snippet in re.split(r"\n\s*\n", content) if snippet.strip()]
+
+
+class KnowledgeBase:
+    # Per-account index of transaction descriptions plus the shared policy
+    # snippets. sync() embeds only what is new: transactions past the stored
+    # ledger offset, and policies whose text hash is not indexed yet.
+
+    def __init__(self, account_id=None, policies_path=POLICIES_PATH, index_path=None,
+                 embedder=None):
+        account = get_account(account_id)
+        self.ledger_path = account.ledger_path
+        self.policies_path = policies_path
+        # Named after the ledger, like its .bin cache, so accounts whose
+        # ledgers share a directory never share an index
+        self.index_path = index_path or os.path.splitext(account.ledger_path)[0] + ".vector_index"
+        self.embedder = embedder or HashingEmbedder()
+        self.index = VectorIndex.load(self.index_path, self.embedder.dim)
+
+        # An index built from another ledger (a copied or renamed file) must
+        # not leak its transactions into this account's prompts
+        ledger = os.path.abspath(self.ledger_path)
+        if self.index.meta.get("ledger_path") != ledger:
+            self.index = VectorIndex(self.embedder.dim)
+            self.index.meta["ledger_path"] = ledger
+        self._synced = None
+        # Ledger fingerprint the on-disk index was last found current for
+        self._validated = None
+        self._lock = threading.Lock()
+        self._builder = None
+
+    def sync(self):
+        state = (file_fingerprint(self.ledger_path), file_fingerprint(self.policies_path))
+        with self._lock:
+            if state == self._synced:
+                return 0
+
+            added = self._sync_transactions() + self._sync_policies()
+            # Only the new rows and the header are written
+            self.index.persist(self.index_path)
+            self._synced = state
+            return added
+
+    def _offset_is_valid(self):
+        return ledger_offset_is_valid(
+            self.ledger_path,
+            self.index.meta.get("ledger_offset"),
+            self.index.meta.get("ledger_window_digest", "")
+        )
+
+    def _sync_transactions(self, batch_size=1000):
+        # Resume from the stored offset only if no earlier row was edited
+        offset = self.index.meta.get("ledger_offset")
+        if not self._offset_is_valid():
+            self.index.remove_kind("transaction")
+            offset = None
+
+        stream = TransactionStream(self.ledger_path, start_offset=offset)
+        added = 0
+        batch = []
+        for txn in stream:
+            batch.append(txn)
+            if len(batch) >= batch_size:
+                added += self._add_transactions(batch)
+                batch = []
+        if batch:
+            added += self._add_transactions(batch)
+
+        self.index.meta["ledger_offset"] = stream.offset
+        self.index.meta["ledger_window_digest"] = (
+            ledger_window_digest(self.ledger_path, stream.offset) if stream.offset else ""
+        )
+        return added
+
+    def _add_transactions(self, transactions):
+        texts = [transaction_text(txn) for txn in transactions]
+        doc_ids = [f"txn:{txn.get('transaction_id') or text}" for txn, text in zip(transactions, texts)]
+        return self.index.add(doc_ids, texts, "transaction", self.embedder.embed(texts))
+
+    def _sync_policies(self):
+        snippets = load_policy_snippets(self.policies_path)
+        doc_ids = [
+            "policy:" + hashlib.sha1(snippet.encode("utf-8")).hexdigest()
+            for snippet in snippets
+        ]
+
+        # Drop snippets that were edited out of the file
+        if set(doc_ids) != {self.index.ids[i] for i in self.index._rows("policy").tolist()}:
+            self.index.remove_kind("policy")
+
+        if not snippets:
+            return 0
+        return self.index.add(doc_ids, snippets, "policy", self.embedder.embed(snippets))
+
+    def needs_full_build(self):
+        # A large ledger with no usable index on disk takes seconds to embed;
+        # that work belongs in the background, not in a request
+        if self._synced is not None:
+            return False
+        # Reruns with an unchanged ledger cost one stat call, not a check
+        fingerprint = file_fingerprint(self.ledger_path)
+        if fingerprint == self._validated:
+            return False
+        if self._offset_is_valid():
+            self._validated = fingerprint
+            return False
+        try:
+            return os.path.getsize(self.ledger_path) > config.RETRIEVAL_INLINE_BUILD_BYTES
+        except OSError:
+            return False
+
+    def build_in_background(self):
+        with self._lock:
+            if self._builder is not None and self._builder.is_alive():
+                return self._builder
+            self._builder = threading.Thread(
+                target=self.sync, name=f"index:{self.ledger_path}", daemon=True
+            )
+            self._builder.start()
+            return self._builder
+
+    def retrieve(self, query, transactions=5, policies=3):
+        if self.needs_full_build():
+            # Answer without retrieved context until the index is ready
+            self.build_in_background()
+            return {"transactions": [], "policies": []}
+
+        self.sync()
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            return {
+                "transactions": [hit["text"] for hit in self.index.search(vector, transactions, "transaction")],
+                "policies": [hit["text"] for hit in self.index.search(vector, policies, "policy")]
+            }
+
+
+# Each index holds its whole vector matrix, so only the most recently used
+# few stay loaded; an evicted one reloads from disk
+_knowledge_bases = OrderedDict()
+_knowledge_lock = threading.Lock()
+
+
+def get_knowledge_base(account_id=None):
+    ledger_path = get_account(account_id).ledger_path
+    with _knowledge_lock:
+        knowledge_base = _knowledge_bases.get(ledger_path)
+        if knowledge_base is None:
+            knowledge_base = _knowledge_bases[ledger_path] = KnowledgeBase(account_id)
+        _knowledge_bases.move_to_end(ledger_path)
+        while len(_knowledge_bases) > config.RETRIEVAL_MAX_INDEXES:
+            _knowledge_bases.popitem(last=False)
+        return knowledge_base
+
+
+def warm_knowledge_base(account_id=None):
+    # Starts building the account's index off the request path; a no-op once
+    # the index is current
+    knowledge_base = get_knowledge_base(account_id)
+    if knowledge_base.needs_full_build():
+        knowledge_base.build_in_background()
+    return knowledge_base
+
+
+def retrieve_context(query, account_id=None, transactions=5, policies=3):
+    return get_knowledge_base(account_id).retrieve(query, transactions, policies)